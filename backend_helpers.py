@@ -0,0 +1,361 @@
+"""
+Versions of the merging, pivoting, averaging, and cleaning functions in
+helpers.py that run on multithreaded columnar dataframe libraries (Polars or
+DuckDB) instead of pandas.
+
+Each function takes and returns pandas dataframes that match the pandas
+versions, so they can be chosen with the backend argument of the functions in
+helpers.py.
+"""
+
+# Disable pylint's C0415: Import outside toplevel (import-outside-toplevel),
+# because helpers.py imports this module and this module uses helpers.py
+# pylint: disable=C0415
+
+import re  # regex library for finding year columns
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+
+# Polars and DuckDB are optional, and only needed to use their backends
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Backends that functions in helpers.py can run on
+BACKENDS = ["pandas", "polars", "duckdb"]
+
+def backend_function(name, backend):
+    """
+    Find the version of a function in helpers.py for a backend.
+
+    Args:
+        name: a string representing the name of the function in helpers.py
+        backend: a string representing the backend ("polars" or "duckdb")
+    Returns:
+        The function for that backend.
+    """
+    if backend not in BACKENDS[1:]:
+        raise ValueError(f"Unknown backend: {backend} (choose from {BACKENDS})")
+    if {"polars": pl, "duckdb": duckdb}[backend] is None:
+        raise ImportError(f"The {backend} backend needs {backend} to be installed.")
+    return globals()[f"{backend}_{name}"]
+
+
+def polars_to_pandas(frame):
+    """
+    Convert a Polars dataframe to pandas without needing pyarrow.
+
+    Args:
+        frame: Polars dataframe
+    Returns:
+        The pandas dataframe, with missing integers stored as float NaN as
+        pandas does.
+    """
+    return pd.DataFrame({column: frame[column].to_numpy() for column in frame.columns})
+
+
+def year_columns(columns):
+    """
+    Find the columns that belong to a year (e.g. "Gold-2004").
+
+    Args:
+        columns: a list of column names
+    Returns:
+        A list of the names of the columns that end with a year.
+    """
+    return [column for column in columns if re.fullmatch(r".+-\d{4}", str(column))]
+
+
+def quote(name):
+    """
+    Quote a column or table name for SQL.
+
+    Args:
+        name: a string representing the name
+    Returns:
+        The quoted name.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def merge_order(method, left, right):
+    """
+    Find the columns to sort merged rows by so that they are in the same order
+    as after a pandas merge.
+
+    Pandas keeps the order of the right dataframe for right merges, and
+    otherwise the order of the left dataframe, followed by any rows found only
+    in the right one.
+
+    Args:
+        method: a string representing the kind of merge ("left", "inner",
+            "outer", or "right")
+        left: name of the column numbering the rows of the left dataframe
+        right: name of the column numbering the rows of the right dataframe
+    Returns:
+        A list of the names of the columns to sort by, most important first.
+    """
+    if method not in ["left", "inner", "outer", "right"]:
+        raise ValueError(f"Unknown merge method: {method}")
+    return [right, left] if method == "right" else [left, right]
+
+
+def polars_merge_dataframes(df_list, method="left", merge_on="Country"):
+    """
+    Merge dataframes with Polars (see merge_dataframes in helpers.py).
+    """
+    how = {"outer": "full"}.get(method, method)
+    total = pl.from_pandas(df_list[0])
+    floats = set()
+    for data_frame in df_list[1:]:
+        right = pl.from_pandas(data_frame)
+        new_columns = [column for column in right.columns if column != merge_on]
+        joined = total.with_row_index("__left").join(
+            right.with_row_index("__right"), on=merge_on, how=how, coalesce=True)
+        # Columns of a side with unmatched rows become floats in pandas
+        if joined["__left"].null_count():
+            floats.update(column for column in total.columns if column != merge_on)
+        if joined["__right"].null_count():
+            floats.update(new_columns)
+        # Put the rows and columns in the order pandas would
+        total = (joined.sort(merge_order(method, "__left", "__right"), nulls_last=True,
+                             maintain_order=True)
+                 .select(total.columns + new_columns))
+    return integers_to_float(polars_to_pandas(total), floats)
+
+
+def duckdb_merge_dataframes(df_list, method="left", merge_on="Country"):
+    """
+    Merge dataframes with DuckDB (see merge_dataframes in helpers.py).
+    """
+    how = {"left": "LEFT", "inner": "INNER", "outer": "FULL OUTER", "right": "RIGHT"}[method]
+    connection = duckdb.connect()
+    connection.register("t0", df_list[0].assign(__order=np.arange(len(df_list[0]))))
+    previous = "t0"
+    columns = list(df_list[0].columns)
+    floats = set()
+    for number, data_frame in enumerate(df_list[1:], 1):
+        connection.register(f"t{number}", data_frame.assign(__right=np.arange(len(data_frame))))
+        # Number the merged rows in the order pandas would put them in
+        order = ", ".join(f"{column} NULLS LAST"
+                          for column in merge_order(method, "l.__order", "r.__right"))
+        connection.execute(
+            f"CREATE TEMP TABLE m{number} AS SELECT * EXCLUDE (__order, __right), "
+            "l.__order IS NULL AS __no_left, r.__right IS NULL AS __no_right, "
+            f"row_number() OVER (ORDER BY {order}) AS __order "
+            f"FROM {previous} AS l {how} JOIN t{number} AS r USING ({quote(merge_on)})")
+        new_columns = [column for column in data_frame.columns if column != merge_on]
+        # Columns of a side with unmatched rows become floats in pandas
+        no_left, no_right = connection.execute(
+            f"SELECT bool_or(__no_left), bool_or(__no_right) FROM m{number}").fetchone()
+        if no_left:
+            floats.update(column for column in columns if column != merge_on)
+        if no_right:
+            floats.update(new_columns)
+        columns += new_columns
+        previous = f"(SELECT * EXCLUDE (__no_left, __no_right) FROM m{number})"
+    total = connection.execute(f"SELECT * EXCLUDE (__order) FROM {previous} AS l "
+                               "ORDER BY __order").df()
+    return integers_to_float(duckdb_to_pandas(total), floats)
+
+
+def integers_to_float(data_frame, columns):
+    """
+    Store integer columns as floats, as pandas does once they have had missing
+    values.
+
+    Args:
+        data_frame: pandas dataframe
+        columns: a collection of the names of the columns to change
+    Returns:
+        The dataframe with those of the columns that hold integers changed to
+        floats.
+    """
+    for column in columns:
+        if pd.api.types.is_integer_dtype(data_frame[column]):
+            data_frame[column] = data_frame[column].astype(float)
+    return data_frame
+
+
+def duckdb_to_pandas(data_frame):
+    """
+    Give the columns of a dataframe from DuckDB the dtypes pandas would use.
+
+    DuckDB returns integer columns with missing values as nullable integers,
+    but pandas stores them as floats with NaN, which numpy can work with.
+
+    Args:
+        data_frame: pandas dataframe returned by DuckDB
+    Returns:
+        The dataframe with nullable columns changed to numpy dtypes.
+    """
+    for column in data_frame.columns:
+        dtype = data_frame[column].dtype
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(dtype, "numpy_dtype"):
+            if data_frame[column].isna().any():
+                data_frame[column] = data_frame[column].astype(float)
+            else:
+                data_frame[column] = data_frame[column].astype(dtype.numpy_dtype)
+    return data_frame
+
+
+def finish_pivot(new_data, id_columns):
+    """
+    Sort the rows and columns of pivoted data as the pandas version of pivot
+    does and add its success rate column.
+
+    Args:
+        new_data: pandas dataframe of pivoted data
+        id_columns: a list of the columns that are not pivoted
+    Returns:
+        The finished pivoted dataframe.
+    """
+    from helpers import derive_metrics
+
+    types = sorted(set(new_data.columns) - set(id_columns) - {"Year"})
+    new_data = new_data.sort_values(id_columns + ["Year"], kind="stable")
+    new_data = new_data[id_columns + ["Year"] + types].reset_index(drop=True)
+    return derive_metrics(new_data, ["Success Rate"])
+
+
+def polars_pivot(data_frame):
+    """
+    Pivot olympic data with Polars (see pivot in helpers.py).
+    """
+    columns = year_columns(data_frame.columns)
+    id_columns = [column for column in data_frame.columns if column not in columns]
+    new_data = (
+        pl.from_pandas(data_frame)
+        .unpivot(on=columns, index=id_columns, variable_name="Var", value_name="val")
+        .with_columns(pl.col("Var").str.extract(r"^(.+)-\d{4}$", 1).alias("Type"),
+                      pl.col("Var").str.extract(r"-(\d{4})$", 1).alias("Year"))
+        .pivot(on="Type", index=id_columns + ["Year"], values="val")
+    )
+    return finish_pivot(polars_to_pandas(new_data), id_columns)
+
+
+def duckdb_pivot(data_frame):
+    """
+    Pivot olympic data with DuckDB (see pivot in helpers.py).
+    """
+    columns = year_columns(data_frame.columns)
+    id_columns = [column for column in data_frame.columns if column not in columns]
+    connection = duckdb.connect()
+    connection.register("wide", data_frame)
+    names = ", ".join(quote(column) for column in columns)
+    ids = ", ".join(quote(column) for column in id_columns)
+    query = (f"PIVOT (SELECT * EXCLUDE (Var), "
+             f"regexp_extract(Var, '^(.+)-\\d{{4}}$', 1) AS Type, "
+             f"regexp_extract(Var, '-(\\d{{4}})$', 1) AS Year "
+             f"FROM (UNPIVOT wide ON {names} INTO NAME Var VALUE val)) "
+             f"ON Type USING first(val) GROUP BY {ids}, Year")
+    return finish_pivot(connection.execute(query).df(), id_columns)
+
+
+def polars_average_data(data_frame):
+    """
+    Average olympic data with Polars (see average_data in helpers.py).
+    """
+    from helpers import AVERAGED_METRICS, get_years
+
+    years = get_years(data_frame)
+    averages = []
+    for metric in AVERAGED_METRICS:
+        # Adding the years one after another keeps missing values missing
+        total = pl.col(f"{metric}-{years[0]}").cast(pl.Float64)
+        for year in years[1:]:
+            total = total + pl.col(f"{metric}-{year}")
+        averages.append((total / len(years)).alias(f"Average {metric}"))
+    new_data = pl.from_pandas(data_frame).select(pl.col("Country"), *averages)
+    return polars_to_pandas(new_data)
+
+
+def duckdb_average_data(data_frame):
+    """
+    Average olympic data with DuckDB (see average_data in helpers.py).
+    """
+    from helpers import AVERAGED_METRICS, get_years
+
+    years = get_years(data_frame)
+    averages = []
+    for metric in AVERAGED_METRICS:
+        # Adding the years one after another keeps missing values missing
+        total = " + ".join(f"CAST({quote(f'{metric}-{year}')} AS DOUBLE)" for year in years)
+        averages.append(f"({total}) / {len(years)} AS {quote(f'Average {metric}')}")
+    connection = duckdb.connect()
+    connection.register("wide", data_frame)
+    return connection.execute(f"SELECT Country, {', '.join(averages)} FROM wide").df()
+
+
+def polars_clean_gdp_data(input_path):
+    """
+    Clean GDP data with Polars (see clean_gdp_data in helpers.py).
+    """
+    from helpers import GDP_ADDED_ROWS, GDP_YEARS, RENAMED_COUNTRIES
+    gdp_total = (
+        pl.read_csv(input_path)
+        .select(pl.col("Country (or dependent territory)").alias("Country"),
+                *[pl.col(year).alias(name) for year, name in GDP_YEARS.items()])
+        .with_columns(pl.col("Country").replace(RENAMED_COUNTRIES))
+    )
+    gdp_total = polars_to_pandas(gdp_total)
+    return pd.concat([gdp_total, GDP_ADDED_ROWS], ignore_index=True)
+
+
+def duckdb_clean_gdp_data(input_path):
+    """
+    Clean GDP data with DuckDB (see clean_gdp_data in helpers.py).
+    """
+    from helpers import GDP_ADDED_ROWS, GDP_YEARS
+    years = ", ".join(f"{quote(year)} AS {quote(name)}" for year, name in GDP_YEARS.items())
+    gdp_total = duckdb.connect().execute(
+        f"SELECT {country_sql()} AS Country, {years} "
+        f"FROM read_csv(?, header = true)", [input_path]).df()
+    return pd.concat([gdp_total, GDP_ADDED_ROWS], ignore_index=True)
+
+
+def polars_clean_population_data(input_path):
+    """
+    Clean population data with Polars (see clean_population_data in helpers.py).
+    """
+    from helpers import POP_YEARS, RENAMED_COUNTRIES
+    population = (
+        pl.read_csv(input_path)
+        .select(pl.col("Country (or dependent territory)").alias("Country"),
+                *[(pl.col(year) * 1000).alias(name) for year, name in POP_YEARS.items()])
+        .with_columns(pl.col("Pop-2008").alias("Pop-2012"),
+                      pl.col("Country").replace(RENAMED_COUNTRIES))
+        .select("Country", "Pop-2004", "Pop-2008", "Pop-2012", "Pop-2016")
+    )
+    return polars_to_pandas(population)
+
+
+def duckdb_clean_population_data(input_path):
+    """
+    Clean population data with DuckDB (see clean_population_data in helpers.py).
+    """
+    from helpers import POP_YEARS
+    years = ", ".join(f"{quote(year)} * 1000 AS {quote(name)}" for year, name in POP_YEARS.items())
+    population = duckdb.connect().execute(
+        f"SELECT {country_sql()} AS Country, {years} "
+        "FROM read_csv(?, header = true)", [input_path]).df()
+    population["Pop-2012"] = population["Pop-2008"]
+    return population[["Country", "Pop-2004", "Pop-2008", "Pop-2012", "Pop-2016"]]
+
+
+def country_sql():
+    """
+    Write the SQL that renames countries to their olympic committee names.
+
+    Returns:
+        A string of SQL giving the renamed country of each row.
+    """
+    from helpers import RENAMED_COUNTRIES
+    column = quote("Country (or dependent territory)")
+    cases = " ".join(f"WHEN '{old}' THEN '{new}'" for old, new in RENAMED_COUNTRIES.items())
+    return f"CASE {column} {cases} ELSE {column} END"
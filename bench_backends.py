@@ -0,0 +1,158 @@
+"""
+Time merge_dataframes, pivot, average_data, and the cleaners in helpers.py
+with each backend on large synthetic data.
+
+Run it with:
+    python bench_backends.py --countries 10000 100000 --repeat 3
+
+Backends that are not installed are skipped.
+"""
+
+import argparse  # library for command line arguments
+import os  # library for working with files
+import tempfile  # library for a directory to write the raw CSVs to
+import time  # library for timing
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+
+from backend_helpers import BACKENDS, backend_function
+from helpers import (
+    AVERAGED_METRICS,
+    average_data,
+    clean_gdp_data,
+    clean_population_data,
+    merge_dataframes,
+    pivot
+)
+
+# Years of the synthetic wide data
+YEARS = ["2004", "2008", "2012", "2016"]
+
+
+def synthetic_data(num_countries, seed=0):
+    """
+    Create a wide medal dataframe and the raw GDP and population tables for a
+    number of made up countries.
+
+    Args:
+        num_countries: an int representing the number of countries
+        seed: an int seeding the random numbers (default: 0)
+    Returns:
+        A tuple of the wide dataframe, the list of medal, GDP, and population
+        dataframes it is merged from, and the raw GDP and population
+        dataframes as scraped.
+    """
+    rng = np.random.default_rng(seed)
+    countries = [f"Country {i}" for i in range(num_countries)]
+    columns = {"Country": countries}
+    for year in YEARS:
+        for metric in ["Gold", "Silver", "Bronze"]:
+            columns[f"{metric}-{year}"] = rng.integers(0, 50, num_countries)
+        columns[f"Total-{year}"] = sum(columns[f"{metric}-{year}"]
+                                       for metric in ["Gold", "Silver", "Bronze"])
+        columns[f"GDP-{year}"] = rng.uniform(500, 80000, num_countries)
+        columns[f"Pop-{year}"] = rng.uniform(1e5, 1e9, num_countries)
+        columns[f"Athletes-{year}"] = rng.integers(1, 600, num_countries)
+    wide = pd.DataFrame(columns)
+
+    # Split the wide data into the tables that are merged, shuffling the rows
+    # of the later tables as they would be when scraped from other pages
+    parts = []
+    for names in [["Gold", "Silver", "Bronze", "Total", "Athletes"], ["GDP"], ["Pop"]]:
+        part = wide[["Country"] + [f"{name}-{year}" for name in names for year in YEARS]]
+        parts.append(part if not parts else part.sample(frac=1, random_state=seed))
+
+    # Raw tables have every year and the country column named as on wikipedia
+    country = {"Country (or dependent territory)": countries}
+    gdp_raw = pd.DataFrame({**country, **{str(year): rng.uniform(500, 80000, num_countries)
+                                         for year in range(2000, 2020)}})
+    pop_raw = {**country}
+    for number, year in enumerate(range(1985, 2020, 5)):
+        pop_raw[str(year)] = rng.uniform(100, 1e6, num_countries)
+        pop_raw["%" if number == 0 else f"%.{number}"] = rng.uniform(0, 5, num_countries)
+    pop_raw = pd.DataFrame(pop_raw)
+    return wide, parts, gdp_raw, pop_raw
+
+
+def time_call(function, repeat):
+    """
+    Time the fastest of several calls of a function.
+
+    Args:
+        function: a function that takes no arguments
+        repeat: an int representing the number of calls
+    Returns:
+        The fastest time in seconds as a float.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_benchmarks(sizes, repeat=3):
+    """
+    Time each function with each installed backend on synthetic data of each
+    size.
+
+    Args:
+        sizes: a list of ints representing the numbers of countries
+        repeat: an int representing the number of calls to take the fastest
+            of (default: 3)
+    Returns:
+        A dataframe with a row for each size and function, a column of seconds
+        for each backend, and a "Fastest" column.
+    """
+    backends = []
+    for backend in BACKENDS:
+        try:
+            if backend != "pandas":
+                backend_function("pivot", backend)
+            backends.append(backend)
+        except ImportError:
+            print(f"Skipping the {backend} backend because it is not installed.")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            wide, parts, gdp_raw, pop_raw = synthetic_data(size)
+            gdp_path = os.path.join(directory, "gdp_raw.csv")
+            pop_path = os.path.join(directory, "population_raw.csv")
+            gdp_raw.to_csv(gdp_path, index=False)
+            pop_raw.to_csv(pop_path, index=False)
+            calls = {
+                "merge_dataframes": lambda backend: merge_dataframes(parts, backend=backend),
+                "pivot": lambda backend: pivot(wide, backend=backend),
+                "average_data": lambda backend: average_data(
+                    wide[["Country"] + [f"{metric}-{year}" for metric in AVERAGED_METRICS
+                                        for year in YEARS]], backend=backend),
+                "clean_gdp_data": lambda backend: clean_gdp_data(gdp_path, backend=backend),
+                "clean_population_data": lambda backend: clean_population_data(
+                    pop_path, backend=backend),
+            }
+            for name, call in calls.items():
+                row = {"Countries": size, "Function": name}
+                for backend in backends:
+                    row[backend] = time_call(lambda backend=backend, call=call: call(backend),
+                                             repeat)
+                row["Fastest"] = min(backends, key=row.get)
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    """
+    Run the benchmarks from the command line and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--countries", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(run_benchmarks(args.countries, args.repeat).to_string(index=False,
+                                                                float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Time match_keys and reconcile_keys in match_helpers.py on large synthetic
+lists of country names.
+
+Run it with:
+    python bench_match.py --names 2000 10000 20000 --repeat 3
+"""
+
+import argparse  # library for command line arguments
+import time  # library for timing
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+
+from match_helpers import match_keys, reconcile_keys
+
+# Pieces that made up names are built from, with the common endings of real
+# country names so that many names share the same groups of letters
+SYLLABLES = [consonant + vowel for consonant in "bcdfghjklmnprstvwz" for vowel in "aeiou"]
+ENDINGS = ["ia", "land", "stan", "ana", "ea", "ica", "ando", "o"]
+
+
+def synthetic_names(num_names, seed=0):
+    """
+    Create made up country names and a misspelled copy of each.
+
+    Args:
+        num_names: an int representing the number of names
+        seed: an int seeding the random numbers (default: 0)
+    Returns:
+        A tuple of the list of names and the list of misspelled names, in the
+        same order.
+    """
+    rng = np.random.default_rng(seed)
+    names = set()
+    while len(names) < num_names:
+        pieces = rng.choice(SYLLABLES, rng.integers(2, 5))
+        names.add("".join(pieces).capitalize() + rng.choice(ENDINGS))
+    names = sorted(names)
+    misspelled = []
+    for name in names:
+        # Replace one letter after the first with another letter
+        position = rng.integers(1, len(name))
+        letter = chr(ord("a") + rng.integers(0, 26))
+        misspelled.append(name[:position] + letter + name[position + 1:])
+    return names, misspelled
+
+
+def time_call(function, repeat):
+    """
+    Time the fastest of several calls of a function.
+
+    Args:
+        function: a function that takes no arguments
+        repeat: an int representing the number of calls
+    Returns:
+        The fastest time in seconds as a float.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_benchmarks(sizes, repeat=3):
+    """
+    Time matching misspelled names to the originals for each number of names.
+
+    Args:
+        sizes: a list of ints representing the numbers of names
+        repeat: an int representing the number of calls to take the fastest
+            of (default: 3)
+    Returns:
+        A dataframe with a row for each size, the seconds taken by match_keys
+        and reconcile_keys, and the number of names matched back to their
+        original.
+    """
+    rows = []
+    for size in sizes:
+        names, misspelled = synthetic_names(size)
+        first = pd.DataFrame({"Country": names})
+        second = pd.DataFrame({"Country": misspelled})
+        matches = match_keys(misspelled, names)
+        originals = dict(zip(misspelled, names))
+        rows.append({"Names": size,
+                     "match_keys": time_call(lambda: match_keys(misspelled, names), repeat),
+                     "reconcile_keys": time_call(lambda: reconcile_keys([first, second]),
+                                                 repeat),
+                     "Matched": int((matches["Key"].map(originals) == matches["Match"]).sum())})
+    return pd.DataFrame(rows)
+
+
+def main():
+    """
+    Run the benchmarks from the command line and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--names", type=int, nargs="+", default=[2000, 10000, 20000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(run_benchmarks(args.names, args.repeat).to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
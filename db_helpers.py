@@ -0,0 +1,191 @@
+"""
+Functions for keeping the olympic dataset in an indexed SQLite database
+instead of loose CSVs, and for querying any subset of it as the wide dataframe
+that pivot and average_data use.
+
+The database has a table of countries, a table of editions (olympic years),
+and a table of facts for each source (medals, population, GDP, and athletes)
+with one row per country and year.
+"""
+
+import re  # regex library for finding year columns
+import sqlite3  # library for the database
+import pandas as pd  # library for data analysis
+
+from backend_helpers import quote
+from helpers import EDITIONS, get_years
+
+# Tables of facts, in the order their columns appear in the merged dataset.
+# Each table maps to the metrics it stores.
+FACT_TABLES = {
+    "medals": ["Gold", "Silver", "Bronze", "Total"],
+    "population": ["Pop"],
+    "gdp": ["GDP"],
+    "athletes": ["Athletes"],
+}
+
+
+def connect_store(store_path):
+    """
+    Open a database, creating its tables and indexes if they do not exist.
+
+    Facts are stored without a type affinity, so integers and floats are
+    returned with the same types they were loaded with.
+
+    Args:
+        store_path: a string representing the filepath of the database (or
+            ":memory:" for one that is not saved)
+    Returns:
+        The sqlite3 connection to the database.
+    """
+    connection = sqlite3.connect(store_path)
+    statements = [
+        "PRAGMA foreign_keys = ON",
+        "CREATE TABLE IF NOT EXISTS countries ("
+        "country_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS editions (year INTEGER PRIMARY KEY, host TEXT)",
+    ]
+    for table, metrics in FACT_TABLES.items():
+        columns = ", ".join(quote(metric) for metric in metrics)
+        # Each fact table is stored in (country_id, year) order, and indexed by
+        # year so that subsets of years are found without a full scan
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "country_id INTEGER NOT NULL REFERENCES countries, "
+            "year INTEGER NOT NULL REFERENCES editions, "
+            f"{columns}, PRIMARY KEY (country_id, year)) WITHOUT ROWID")
+        statements.append(f"CREATE INDEX IF NOT EXISTS {table}_year ON {table} (year)")
+    for statement in statements:
+        connection.execute(statement)
+    return connection
+
+
+def load_frame(connection, data_frame):
+    """
+    Add the facts in a wide dataframe to the database, replacing any facts
+    already stored for the same countries and years.
+
+    Any dataframe with a "Country" column and "<Metric>-<Year>" columns can be
+    loaded, such as the output of scrape_medal_data, clean_gdp_data,
+    clean_population_data, scrape_athlete_data, or the merged dataset. New
+    countries are numbered in the order they first appear, which is the order
+    query_wide returns them in. Rows where every metric of a table is missing
+    for a year are not stored. Everything is inserted in one transaction.
+
+    Args:
+        connection: sqlite3 connection created by connect_store
+        data_frame: wide pandas dataframe of olympic data
+    """
+    years = get_years(data_frame)
+    with connection:
+        # Add any new countries and years
+        connection.executemany("INSERT OR IGNORE INTO countries (name) VALUES (?)",
+                               [(str(name),) for name in data_frame["Country"].dropna()])
+        connection.executemany("INSERT OR IGNORE INTO editions (year, host) VALUES (?, ?)",
+                               [(int(year), EDITIONS.get(year, {}).get("host"))
+                                for year in years])
+        ids = dict(connection.execute("SELECT name, country_id FROM countries"))
+        country_ids = data_frame["Country"].map(lambda name: ids.get(str(name)))
+
+        for table, metrics in FACT_TABLES.items():
+            placeholders = ", ".join("?" for _ in metrics)
+            names = ", ".join(quote(metric) for metric in metrics)
+            for year in years:
+                columns = [f"{metric}-{year}" for metric in metrics]
+                if not all(column in data_frame.columns for column in columns):
+                    continue
+                # Convert to Python numbers with missing values as None
+                values = data_frame[columns].apply(pd.to_numeric, errors="coerce")
+                values = values.astype(object)
+                values = values.where(values.notna(), None)
+                rows = [(country_id, int(year), *row)
+                        for country_id, row in zip(country_ids, values.itertuples(index=False))
+                        if country_id is not None and any(value is not None for value in row)]
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} (country_id, year, {names}) "
+                    f"VALUES (?, ?, {placeholders})", rows)
+
+
+def build_store(store_path, data_frames):
+    """
+    Create a database from the cleaned tables of the dataset.
+
+    Args:
+        store_path: a string representing the filepath of the database
+        data_frames: a list of wide dataframes to load, starting with the
+            medal data so that countries are numbered in medal table order
+            (e.g. the outputs of scrape_medal_data, clean_population_data,
+            clean_gdp_data, and scrape_athlete_data)
+    Returns:
+        The sqlite3 connection to the database.
+    """
+    connection = connect_store(store_path)
+    for data_frame in data_frames:
+        load_frame(connection, data_frame)
+    return connection
+
+
+def query_wide(connection, countries=None, years=None, tables=None):
+    """
+    Load a subset of the database as a wide dataframe, in the same layout as
+    the merged dataset (data/medals_gdp_pop_athletes.csv).
+
+    As in scrape_medal_data and merge_dataframes, only countries that have
+    facts in the first table for every year are kept, and the other tables
+    are merged onto them, with missing facts left as NaN. Each table is
+    pivoted to one column per metric and year inside SQLite, using the
+    (country_id, year) and year indexes.
+
+    Args:
+        connection: sqlite3 connection created by connect_store
+        countries: a list of the names of the countries to load (default: all
+            of them)
+        years: a list of the years to load (default: every year in the
+            database)
+        tables: a list of names of tables in FACT_TABLES to load, in the order
+            of their columns (default: every table in FACT_TABLES)
+    Returns:
+        A dataframe with a "Country" column and a "<Metric>-<Year>" column for
+        each metric and year, with countries in the order they were loaded.
+    """
+    if tables is None:
+        tables = list(FACT_TABLES)
+    if years is None:
+        years = [year for (year,) in connection.execute(
+            "SELECT year FROM editions ORDER BY year")]
+    years = [int(year) for year in years]
+    year_list = ", ".join("?" for _ in years)
+
+    # Only read the facts of the chosen countries
+    country_filter, country_params = "", []
+    if countries is not None:
+        country_filter = (" AND country_id IN (SELECT country_id FROM countries WHERE name IN ("
+                          + ", ".join("?" for _ in countries) + "))")
+        country_params = [str(country) for country in countries]
+
+    columns, joins, params = [], [], []
+    for number, table in enumerate(tables):
+        # Pivot each table to one column per metric and year
+        pivoted = []
+        for year in years:
+            for metric in FACT_TABLES[table]:
+                name = quote(f"{metric}-{year}")
+                pivoted.append(f"MAX(CASE WHEN year = {year} THEN {quote(metric)} END) AS {name}")
+                columns.append(f"t{number}.{name}")
+        # Keep countries with facts for every year in the first table only
+        having = f" HAVING COUNT(*) = {len(years)}" if number == 0 else ""
+        join = "JOIN" if number == 0 else "LEFT JOIN"
+        joins.append(f"{join} (SELECT country_id, {', '.join(pivoted)} FROM {table} "
+                     f"WHERE year IN ({year_list}){country_filter} "
+                     f"GROUP BY country_id{having}) t{number} "
+                     f"ON t{number}.country_id = countries.country_id")
+        params += years + country_params
+
+    query = (f"SELECT countries.name AS Country, {', '.join(columns)} FROM countries "
+             f"{' '.join(joins)} ORDER BY countries.country_id")
+    data_frame = pd.read_sql_query(query, connection, params=params)
+    # Columns of whole numbers with missing values are read as objects
+    for column in data_frame.columns:
+        if re.fullmatch(r".+-\d{4}", column) and data_frame[column].dtype == object:
+            data_frame[column] = pd.to_numeric(data_frame[column])
+    return data_frame
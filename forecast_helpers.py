@@ -0,0 +1,241 @@
+"""
+Functions for forecasting the medal counts of the next olympic games by
+turning fitted medal models into grama models and sampling them.
+
+The next games' GDP, population, and athletes of each country are its latest
+values grown by a random change drawn from the changes between past games
+(with their correlations kept by a Gaussian copula), and each fitted model adds
+its own residual noise. Sampling is vectorized over every country in a batch,
+and batches can be run in a process pool.
+"""
+
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+import patsy  # library for turning formulas into design matrices
+import grama as gr  # library for building and sampling models
+
+from helpers import get_years, run_jobs
+from vis_helpers import FORMULA_NAMESPACE
+
+# Inputs of the medal models that are grown to the next games
+FORECAST_INPUTS = ["GDP", "Pop", "Athletes"]
+
+
+def model_spec(fits):
+    """
+    Describe fitted medal models with plain data so they can be sent to other
+    processes.
+
+    Args:
+        fits: a list of fitted statsmodels OLS results (e.g. from
+            vis_helpers.fit_model), each predicting a medal count from the
+            inputs in FORECAST_INPUTS (e.g. "Total ~ np.log(GDP) + Athletes")
+    Returns:
+        A dictionary mapping the name of each model's response to a
+        dictionary of its "formula", its "params" (a dictionary of
+        coefficients), and "sigma", the standard deviation of its residuals.
+    """
+    spec = {}
+    for fit in fits:
+        spec[fit.model.endog_names] = {"formula": fit.model.formula,
+                                       "params": fit.params.to_dict(),
+                                       "sigma": float(np.sqrt(fit.scale))}
+    return spec
+
+
+def predict_medals(spec, data_frame):
+    """
+    Predict medal counts with fitted medal models, without residual noise.
+
+    Args:
+        spec: dictionary describing the fitted models, from model_spec
+        data_frame: pandas dataframe with a column for each input used by the
+            models' formulas
+    Returns:
+        A dataframe with a column of predictions for each model.
+    """
+    # Look up names used in the formulas (such as np) in FORMULA_NAMESPACE
+    eval_env = patsy.EvalEnvironment([FORMULA_NAMESPACE])
+    predicted = {}
+    designs = {}
+    for output, model in spec.items():
+        # Build each distinct right hand side only once
+        rhs = model["formula"].split("~", 1)[1]
+        if rhs not in designs:
+            designs[rhs] = patsy.dmatrix(rhs, data_frame, eval_env=eval_env,
+                                         NA_action=patsy.NAAction(NA_types=[]),
+                                         return_type="dataframe")
+        design = designs[rhs]
+        params = pd.Series(model["params"])[design.columns].to_numpy()
+        predicted[output] = design.to_numpy() @ params
+    return pd.DataFrame(predicted)
+
+
+def growth_history(data_frame, inputs=None):
+    """
+    Find the change in the log of each input between consecutive games for
+    every country.
+
+    Args:
+        data_frame: pivoted pandas dataframe containing olympic data (with
+            "Country" and "Year" columns)
+        inputs: a list of the inputs to find changes of (default:
+            FORECAST_INPUTS)
+    Returns:
+        A dataframe with a "growth_<input>" column for each input and a row
+        for each country and pair of consecutive games where every input is
+        known.
+    """
+    if inputs is None:
+        inputs = FORECAST_INPUTS
+    data = data_frame.assign(Year=data_frame["Year"].astype(int)).sort_values(["Country", "Year"])
+    growth = pd.DataFrame(index=data.index)
+    for name in inputs:
+        logs = np.log(pd.to_numeric(data[name]).astype(float))
+        growth[f"growth_{name}"] = logs.groupby(data["Country"]).diff()
+    growth = growth.replace([np.inf, -np.inf], np.nan).dropna()
+    return growth.reset_index(drop=True)
+
+
+def medal_model(spec, growth):
+    """
+    Build a grama model that forecasts medal counts at the next games.
+
+    The model's deterministic inputs are a country's latest GDP, Pop, and
+    Athletes. Its random inputs are the change in the log of each of them,
+    with normal marginals and a Gaussian copula fit to past changes, and a
+    standard normal noise for each medal model.
+
+    Args:
+        spec: dictionary describing the fitted models, from model_spec
+        growth: dataframe of past changes, from growth_history
+    Returns:
+        The grama model, with an output for each medal model. Forecasts below
+        zero are set to zero.
+    """
+    inputs = [column[len("growth_"):] for column in growth.columns]
+    noises = [f"noise_{output}" for output in spec]
+
+    def forecast(data_frame):
+        # Grow each input by its sampled change
+        future = pd.DataFrame({name: data_frame[name] * np.exp(data_frame[f"growth_{name}"])
+                               for name in inputs})
+        predicted = predict_medals(spec, future)
+        for output, model in spec.items():
+            predicted[output] += model["sigma"] * data_frame[f"noise_{output}"].to_numpy()
+        return predicted.clip(lower=0).set_axis(data_frame.index)
+
+    marginals = {column: gr.marg_fit("norm", growth[column]) for column in growth.columns}
+    marginals.update({noise: {"dist": "norm", "loc": 0, "scale": 1} for noise in noises})
+    # Only the changes of the inputs are correlated with each other, but grama
+    # needs every pair of random inputs listed
+    random_inputs = list(growth.columns) + noises
+    correlations = growth.corr().reindex(index=random_inputs, columns=random_inputs).fillna(0)
+    df_corr = pd.DataFrame(
+        [(first, second, correlations.loc[first, second])
+         for i, first in enumerate(random_inputs) for second in random_inputs[i + 1:]],
+        columns=["var1", "var2", "corr"])
+
+    return (
+        gr.Model("Medal forecast")
+        >> gr.cp_vec_function(
+            fun=forecast,
+            var=inputs + list(growth.columns) + noises,
+            out=list(spec),
+        )
+        >> gr.cp_marginals(**marginals)
+        >> gr.cp_copula_gaussian(df_corr=df_corr)
+    )
+
+
+def forecast_batch(spec, growth, latest, num_samples, level, seed):
+    """
+    Forecast the medal counts of a batch of countries.
+
+    One set of random inputs is drawn from the model's density and shared by
+    every country in the batch, and the model is evaluated on all of the
+    countries and samples at once.
+
+    Args:
+        spec: dictionary describing the fitted models, from model_spec
+        growth: dataframe of past changes, from growth_history
+        latest: dataframe with a "Country" column and the latest value of
+            each input for each country in the batch
+        num_samples: number of Monte Carlo samples for each country
+        level: the probability covered by each forecast interval
+        seed: seed for drawing the samples
+    Returns:
+        A dataframe with a "Country" column and, for each medal model, the
+        mean forecast and the lower and upper ends of its interval (e.g.
+        "Total", "Total Lower", and "Total Upper").
+    """
+    model = medal_model(spec, growth)
+    samples = model.density.sample(n=num_samples, seed=seed)
+    num_countries = len(latest)
+    # Pair every country with every sample
+    design = {name: np.repeat(latest[name].to_numpy(dtype=float), num_samples)
+              for name in model.var_det}
+    design.update({name: np.tile(samples[name].to_numpy(), num_countries)
+                   for name in samples.columns})
+    results = gr.eval_df(model, df=pd.DataFrame(design), append=False)
+
+    forecasts = pd.DataFrame({"Country": latest["Country"].to_numpy()})
+    tails = [(1 - level) / 2, (1 + level) / 2]
+    for output in spec:
+        values = results[output].to_numpy().reshape(num_countries, num_samples)
+        lower, upper = np.quantile(values, tails, axis=1)
+        forecasts[output] = values.mean(axis=1)
+        forecasts[f"{output} Lower"] = lower
+        forecasts[f"{output} Upper"] = upper
+    return forecasts
+
+
+def forecast_medals(data_frame, fits, num_samples=10000, level=0.9, batch_size=25,
+                    max_workers=1, seed=0):
+    """
+    Forecast the medal counts of every country at the next olympic games, with
+    intervals, by Monte Carlo sampling of the fitted medal models.
+
+    Countries are split into batches that are each sampled in one vectorized
+    evaluation of the grama model (see forecast_batch), and the batches can be
+    run in a process pool. Each batch is seeded by its number, so the
+    forecasts do not depend on the number of workers.
+
+    Args:
+        data_frame: pivoted pandas dataframe containing olympic data (e.g.
+            from pivot)
+        fits: a list of fitted statsmodels OLS results of medal counts on the
+            inputs in FORECAST_INPUTS (e.g. from vis_helpers.fit_model). Their
+            formulas can use numpy as np.
+        num_samples: number of Monte Carlo samples for each country (default:
+            10000)
+        level: the probability covered by each forecast interval (default:
+            0.9)
+        batch_size: number of countries sampled at once (default: 25)
+        max_workers: number of processes to run batches in (default: 1,
+            meaning run them one after another in this process)
+        seed: seed for drawing the samples (default: 0)
+    Returns:
+        A dataframe with a "Country" column, a "Year" column of the next
+        games, and for each medal model the mean forecast and the lower and
+        upper ends of its interval (e.g. "Total", "Total Lower", and "Total
+        Upper").
+    """
+    spec = model_spec(fits)
+    growth = growth_history(data_frame)
+
+    # Start from each country's inputs at the latest games
+    last_year = get_years(data_frame)[-1]
+    latest = data_frame[data_frame["Year"].astype(str) == last_year]
+    latest = latest[["Country"] + FORECAST_INPUTS].apply(
+        lambda column: column if column.name == "Country" else pd.to_numeric(column))
+    latest = latest.dropna().reset_index(drop=True)
+
+    jobs = {}
+    for number, start in enumerate(range(0, len(latest), batch_size)):
+        batch = latest.iloc[start:start + batch_size]
+        jobs[number] = (forecast_batch,
+                        (spec, growth, batch, num_samples, level, seed + number))
+    forecasts = pd.concat(run_jobs(jobs, max_workers).values(), ignore_index=True)
+    forecasts.insert(1, "Year", str(int(last_year) + 4))
+    return forecasts
@@ -15,11 +15,90 @@ Functions for scraping and cleaning olympics data.
 # pandas library
 # pylint: disable=E1137
 
+import ast  # library for finding the metrics used by expressions
+import hashlib  # library for hashing data into fingerprints
 import re # regex library for removing text in square brackets
+from collections import OrderedDict  # library for least recently used caches
+from concurrent.futures import ProcessPoolExecutor  # library for process pools
+import numpy as np  # library for array math
 import pandas as pd  # library for data analysis
 import requests  # library to handle requests
 from bs4 import BeautifulSoup  # library to parse HTML documents
 import grama as gr  # library for data cleaning
+from match_helpers import reconcile_keys  # library for matching country names
+from backend_helpers import backend_function  # library for Polars and DuckDB versions
+
+
+# Olympic games to scrape. Each year maps to its host nation, its medal table
+# page, and its main page along with the index of the table on that page that
+# lists the number of athletes sent by each country.
+EDITIONS = {
+    "2004": {"host": "Greece",
+             "medal_page": "https://en.m.wikipedia.org/wiki/2004_Summer_Olympics_medal_table",
+             "athlete_page": "https://en.wikipedia.org/wiki/2004_Summer_Olympics",
+             "athlete_table": 1},
+    "2008": {"host": "China",
+             "medal_page": "https://en.m.wikipedia.org/wiki/2008_Summer_Olympics_medal_table",
+             "athlete_page": "https://en.wikipedia.org/wiki/2008_Summer_Olympics",
+             "athlete_table": 5},
+    "2012": {"host": "Great Britain",
+             "medal_page": "https://en.m.wikipedia.org/wiki/2012_Summer_Olympics_medal_table",
+             "athlete_page": "https://en.wikipedia.org/wiki/2012_Summer_Olympics",
+             "athlete_table": 1},
+    "2016": {"host": "Brazil",
+             "medal_page": "https://en.wikipedia.org/wiki/2016_Summer_Olympics_medal_table",
+             "athlete_page": "https://en.wikipedia.org/wiki/2016_Summer_Olympics",
+             "athlete_table": 2},
+}
+
+# Wikipedia pages with the population and GDP (PPP) per capita of each country
+POPULATION_PAGE = ("https://en.wikipedia.org/wiki/List_of_countries_by_past_"
+                   "and_projected_future_population#Estimates_between_the_years_1985_and_2015_"
+                   "(in_thousands)")
+GDP_PAGE = ("https://en.wikipedia.org/wiki/"
+            "List_of_countries_by_past_and_projected_GDP_(PPP)_per_capita")
+
+# Years of the raw GDP data used for each olympic year
+GDP_YEARS = {"2004": "GDP-2004", "2008": "GDP-2008", "2012": "GDP-2012", "2016": "GDP-2016"}
+# Years of the raw population data used for each olympic year (the closest
+# year with data; 2012 uses the same year as 2008)
+POP_YEARS = {"2005": "Pop-2004", "2010": "Pop-2008", "2015": "Pop-2016"}
+# Countries missing from the GDP data, with the UN's GDP per capita
+# Source: https://en.wikipedia.org/wiki/List_of_countries_by_past_and_projec
+#         ted_GDP_(nominal)_per_capita#UN_estimates_between_2000_and_2009
+GDP_ADDED_ROWS = pd.DataFrame({"Country": ["Cuba", "North Korea"],
+                               "GDP-2004": [3399, 473],
+                               "GDP-2008": [5386, 551],
+                               "GDP-2012": [6448, 643],
+                               "GDP-2016": [7657, 642]})
+# Countries renamed to their olympic committee names in the GDP and
+# population data
+RENAMED_COUNTRIES = {"United Kingdom": "Great Britain", "Taiwan": "Chinese Taipei"}
+
+# Derived metrics that can be computed from the base metrics (Gold, Silver,
+# Bronze, Total, GDP, Pop, Athletes) of any edition. Each value is an
+# expression that is evaluated by pandas.eval, so it can use the base metric
+# names, numbers, and arithmetic operators. Pop is in thousands of people, as
+# in the datasets in data/ and the population plots.
+METRICS = {
+    "Success Rate": "Total / Athletes",
+    "Medals per Million": "Total / Pop * 1000",
+    "Medals per 1k GDP": "Total / GDP * 1000",
+    "Gold Share": "Gold / Total",
+    "Medal Points": "3 * Gold + 2 * Silver + Bronze",
+}
+
+# Metrics that are averaged over every year by average_data
+AVERAGED_METRICS = ["Total", "GDP", "Pop", "Athletes"]
+
+# Ways to rank the medal table. Each method maps to the name of its rank
+# column and the metrics that are compared in order, where later metrics are
+# only used to break ties in earlier ones.
+RANKING_METHODS = {
+    "gold": ("Rank", ["Gold", "Silver", "Bronze"]),
+    "total": ("Total Rank", ["Total", "Gold", "Silver", "Bronze"]),
+    "weighted": ("Weighted Rank", ["Medal Points"]),
+}
 
 
 def table_scrape(url, index=0):
@@ -71,7 +150,8 @@ def scrape_medal_table(url, year, host):
     table.rename(columns={"NOC": "Country", "Nation": "Country",
                           "Gold": f"Gold-{year}", "Silver": f"Silver-{year}",
                           "Bronze": f"Bronze-{year}", "Total": f"Total-{year}"}, inplace=True)
-    # Drop rank column because it's not relevant for our question
+    # Drop rank column because ranks are recomputed for every year at once
+    # with rank_medals()
     table.drop(["Rank"], axis=1, inplace=True)
     table.replace({f"{host}*": f"{host}"}, inplace=True)
 
@@ -80,33 +160,28 @@ def scrape_medal_table(url, year, host):
     return table
 
 
-def scrape_medal_data(output_path=None):
+def scrape_medal_data(output_path=None, max_workers=1):
     """
     Scrapes medal data for desired years from Wikipedia and merges them into
     one dataframe.
 
     Args:
         output_path: name of file that the dataframe will save to (optional).
+        max_workers: number of processes used to scrape and format the tables
+            of each year at the same time (default: 1, meaning scrape each year
+            one after another in this process).
     Returns:
         The merged dataframe.
     """
-    # Wikipedia pages to scrape
-    pg_2004 = "https://en.m.wikipedia.org/wiki/2004_Summer_Olympics_medal_table"
-    pg_2008 = "https://en.m.wikipedia.org/wiki/2008_Summer_Olympics_medal_table"
-    pg_2012 = "https://en.m.wikipedia.org/wiki/2012_Summer_Olympics_medal_table"
-    pg_2016 = "https://en.wikipedia.org/wiki/2016_Summer_Olympics_medal_table"
-
     # Scrape each page to a pandas dataframe, format with date, and remove "*"
     # next to each host country's name.
-    medals_2004 = scrape_medal_table(pg_2004, "2004", "Greece")
-    medals_2008 = scrape_medal_table(pg_2008, "2008", "China")
-    medals_2012 = scrape_medal_table(pg_2012, "2012", "Great Britain")
-    medals_2016 = scrape_medal_table(pg_2016, "2016", "Brazil")
+    jobs = {year: (scrape_medal_table, (edition["medal_page"], year, edition["host"]))
+            for year, edition in EDITIONS.items()}
+    medal_tables = run_jobs(jobs, max_workers)
 
-    # Merge the 4 dataframes into 1, only keeping countries that medalled in
-    # all 4 years
-    medals_all = merge_dataframes([medals_2004, medals_2008, medals_2012, medals_2016],
-                                  method="inner")
+    # Merge the dataframes into 1, only keeping countries that medalled in
+    # every year
+    medals_all = merge_dataframes(list(medal_tables.values()), method="inner")
 
     # If a location to save a csv is given, save it there
     if output_path is not None:
@@ -125,10 +200,7 @@ def scrape_population_data(output_path=None):
         Dataframe containing scraped population data.
     """
     # Scrape the second table on the wikipedia page for country populations
-    wikipedia_page = ("https://en.wikipedia.org/wiki/List_of_countries_by_past_"
-                      "and_projected_future_population#Estimates_between_the_years_1985_and_2015_"
-                      "(in_thousands)")
-    population = table_scrape(wikipedia_page, 1)
+    population = table_scrape(POPULATION_PAGE, 1)
 
     # If a location to save a csv is given, save it there
     if output_path is not None:
@@ -137,7 +209,7 @@ def scrape_population_data(output_path=None):
     return population
 
 
-def clean_population_data(input_path, output_path=None):
+def clean_population_data(input_path, output_path=None, backend="pandas"):
     """
     Clean population data from wikipedia by removing unnecessary years and
     percentages of population to leave whole numbers.
@@ -153,19 +225,23 @@ def clean_population_data(input_path, output_path=None):
         input_path: a string representing the filepath of of the CSV of the
             dataframe that needs to be cleaned.
         output_path: name of file that the dataframe will save to (optional).
+        backend: a string representing the dataframe library to clean the
+            data with, one of backend_helpers.BACKENDS (default: "pandas")
     Returns:
         The cleaned population dataframe.
     """
+    # Clean the data with Polars or DuckDB if asked to
+    if backend != "pandas":
+        population = backend_function("clean_population_data", backend)(input_path)
+        if output_path is not None:
+            population.to_csv(output_path, index=False)
+        return population
+
     population = pd.read_csv(input_path)
-    # Drop unnecessary years
-    population.drop(["1985", "1990", "1995", "2000", "%", "%.1", "%.2", "%.3", "%.4", "%.5", "%.6"],
-                    axis=1, inplace=True)
-
-    # Rename columns to be associated with the correct olympic years
-    population.rename(columns={"Country (or dependent territory)": "Country",
-                               "2005": "Pop-2004",
-                               "2010": "Pop-2008",
-                               "2015": "Pop-2016"}, inplace=True)
+    # Keep only the years used and rename them to the correct olympic years
+    population = population[["Country (or dependent territory)"] + list(POP_YEARS)]
+    population = population.rename(columns={"Country (or dependent territory)": "Country",
+                                            **POP_YEARS})
     # Create a column for the population in 2012 and duplicate 2008 into it
     population["Pop-2012"] = population["Pop-2008"]
     # Reorder population dataframe to be chronological
@@ -179,8 +255,7 @@ def clean_population_data(input_path, output_path=None):
         population[col] = population[col]*1000
 
     # Rename the UK and Taiwan rows to match their olympic committee names
-    population.replace({"United Kingdom": "Great Britain"}, inplace=True)
-    population.replace({"Taiwan": "Chinese Taipei"}, inplace=True)
+    population = population.replace(RENAMED_COUNTRIES)
 
     # If a location to save a csv is given, save it there
     if output_path is not None:
@@ -199,10 +274,8 @@ def scrape_gdp_data(output_path=None):
         A dataframe containing the scraped GDP data.
     """
     # Scrape the 3rd and 4th tables on the GDP (PPP) per capita wikipedia page
-    wikipedia_page = ("https://en.wikipedia.org/wiki/"
-                      "List_of_countries_by_past_and_projected_GDP_(PPP)_per_capita")
-    gdp_2000s = table_scrape(wikipedia_page, 2)
-    gdp_2010s = table_scrape(wikipedia_page, 3)
+    gdp_2000s = table_scrape(GDP_PAGE, 2)
+    gdp_2010s = table_scrape(GDP_PAGE, 3)
 
     # Merge the dataframes
     gdp_total = merge_dataframes([gdp_2000s, gdp_2010s],
@@ -215,7 +288,7 @@ def scrape_gdp_data(output_path=None):
     return gdp_total
 
 
-def clean_gdp_data(input_path, output_path=None):
+def clean_gdp_data(input_path, output_path=None, backend="pandas"):
     """
     Clean GDP data by dropping unnecessary years, renaming columns, and adding
     missing competitors.
@@ -227,42 +300,30 @@ def clean_gdp_data(input_path, output_path=None):
         input_path: a string representing the filepath of of the CSV of the
             dataframe that needs to be cleaned.
         output_path: name of file that the dataframe will save to (optional).
+        backend: a string representing the dataframe library to clean the
+            data with, one of backend_helpers.BACKENDS (default: "pandas")
     Returns:
         Cleaned GDP dataframe.
     """
-    gdp_total = pd.read_csv(input_path)
+    # Clean the data with Polars or DuckDB if asked to
+    if backend != "pandas":
+        gdp_total = backend_function("clean_gdp_data", backend)(input_path)
+        if output_path is not None:
+            gdp_total.to_csv(output_path, index=False)
+        return gdp_total
 
-    # Drop unnecssary years
-    gdp_total.drop(["2000", "2001", "2002", "2003", "2005", "2006", "2007",
-                    "2009", "2010", "2011", "2013", "2014", "2015", "2017", "2018", "2019"],
-                   axis=1, inplace=True)
+    gdp_total = pd.read_csv(input_path)
 
-    # Rename to include GDP in all column titles
-    gdp_total.rename(columns={"Country (or dependent territory)": "Country",
-                              "2004": "GDP-2004",
-                              "2008": "GDP-2008",
-                              "2012": "GDP-2012",
-                              "2016": "GDP-2016"}, inplace=True)
+    # Keep only the olympic years and rename them to include GDP
+    gdp_total = gdp_total[["Country (or dependent territory)"] + list(GDP_YEARS)]
+    gdp_total = gdp_total.rename(columns={"Country (or dependent territory)": "Country",
+                                          **GDP_YEARS})
 
     # Rename the UK and Taiwan to their olympic committee names
-    gdp_total.replace({"United Kingdom": "Great Britain"}, inplace=True)
-    gdp_total.replace({"Taiwan": "Chinese Taipei"}, inplace=True)
+    gdp_total = gdp_total.replace(RENAMED_COUNTRIES)
 
     # Use the UN's GDP per capita data for Cuba and North Korea
-    # Source: https://en.wikipedia.org/wiki/List_of_countries_by_past_and_projec
-    #         ted_GDP_(nominal)_per_capita#UN_estimates_between_2000_and_2009
-    cuba_row = {"Country": "Cuba",
-                "GDP-2004": 3399,
-                "GDP-2008": 5386,
-                "GDP-2012": 6448,
-                "GDP-2016": 7657}
-    gdp_total = gdp_total.append(cuba_row, ignore_index=True)
-    north_korea_row = {"Country": "North Korea",
-                       "GDP-2004": 473,
-                       "GDP-2008": 551,
-                       "GDP-2012": 643,
-                       "GDP-2016": 642}
-    gdp_total = gdp_total.append(north_korea_row, ignore_index=True)
+    gdp_total = pd.concat([gdp_total, GDP_ADDED_ROWS], ignore_index=True)
 
     # If a location to save a csv is given, save it there
     if output_path is not None:
@@ -271,6 +332,40 @@ def clean_gdp_data(input_path, output_path=None):
     return gdp_total
 
 
+def clean_data(gdp_input_path, population_input_path, gdp_output_path=None,
+               population_output_path=None, max_workers=1, backend="pandas"):
+    """
+    Clean the GDP and population data, optionally at the same time in a
+    process pool (see clean_gdp_data and clean_population_data).
+
+    Starting the processes takes longer than cleaning the tables scraped from
+    wikipedia, so a pool only helps with much larger raw data.
+
+    Args:
+        gdp_input_path: a string representing the filepath of the CSV of the
+            raw GDP data.
+        population_input_path: a string representing the filepath of the CSV
+            of the raw population data.
+        gdp_output_path: name of file that the cleaned GDP dataframe will save
+            to (optional).
+        population_output_path: name of file that the cleaned population
+            dataframe will save to (optional).
+        max_workers: number of processes to clean the datasets in (default: 1,
+            meaning clean them one after another in this process; 2 cleans
+            each dataset in its own process).
+        backend: a string representing the dataframe library to clean the
+            data with, one of backend_helpers.BACKENDS (default: "pandas")
+    Returns:
+        A tuple of the cleaned GDP and population dataframes.
+    """
+    # Each process saves its own CSV, so only the dataframes are sent back
+    jobs = {"gdp": (clean_gdp_data, (gdp_input_path, gdp_output_path, backend)),
+            "population": (clean_population_data,
+                           (population_input_path, population_output_path, backend))}
+    cleaned = run_jobs(jobs, max_workers)
+    return cleaned["gdp"], cleaned["population"]
+
+
 def scrape_athlete_table(url, table_num, year):
     """
     Convert the table on the wikipedia page for an olympic games that lists
@@ -339,32 +434,28 @@ def scrape_athlete_table(url, table_num, year):
     return data_frame
 
 
-def scrape_athlete_data(output_path=None):
+def scrape_athlete_data(output_path=None, max_workers=1):
     """
     Scrapes the number of athletes sent to the olympics by each country for the
     summer olympics 2004-2016 from Wikipedia and merges them into one dataframe.
 
     Args:
         output_path: name of file that the dataframe will save to (optional).
+        max_workers: number of processes used to scrape and format the tables
+            of each year at the same time (default: 1, meaning scrape each year
+            one after another in this process).
     Returns:
         The merged dataframe.
     """
-    #                            Wikipedia page               Table on page
-    pg_2004 = ["https://en.wikipedia.org/wiki/2004_Summer_Olympics", 1]
-    pg_2008 = ["https://en.wikipedia.org/wiki/2008_Summer_Olympics", 5]
-    pg_2012 = ["https://en.wikipedia.org/wiki/2012_Summer_Olympics", 1]
-    pg_2016 = ["https://en.wikipedia.org/wiki/2016_Summer_Olympics", 2]
-
     # Scrape the tables that list the number of athletes competing for each
-    # country on each summer olympics page 2004-2016
-    df_2004 = scrape_athlete_table(pg_2004[0], pg_2004[1], 2004)
-    df_2008 = scrape_athlete_table(pg_2008[0], pg_2008[1], 2008)
-    df_2012 = scrape_athlete_table(pg_2012[0], pg_2012[1], 2012)
-    df_2016 = scrape_athlete_table(pg_2016[0], pg_2016[1], 2016)
+    # country on each summer olympics page
+    jobs = {year: (scrape_athlete_table,
+                   (edition["athlete_page"], edition["athlete_table"], year))
+            for year, edition in EDITIONS.items()}
+    athlete_tables = run_jobs(jobs, max_workers)
 
     # Merge the dataframes for each year into one
-    all_athlete_dfs = [df_2004, df_2008, df_2012, df_2016]
-    total = merge_dataframes(all_athlete_dfs)
+    total = merge_dataframes(list(athlete_tables.values()))
 
     # If a location to save a csv is given, save it there
     if output_path is not None:
@@ -373,8 +464,37 @@ def scrape_athlete_data(output_path=None):
     return total
 
 
+def run_jobs(jobs, max_workers=None):
+    """
+    Run independent scraping or cleaning jobs, such as clean_gdp_data and
+    clean_population_data or the tables of each year, in a process pool.
+
+    Each job runs in its own process, so CPU-bound pandas work for different
+    datasets and years runs at the same time on different cores.
+
+    Args:
+        jobs: a dictionary mapping the name of each job to a tuple of a
+            module-level function (e.g. clean_gdp_data) and a tuple of the
+            arguments to call it with
+        max_workers: number of processes to use (default: None, meaning one
+            per core). If it is 1, the jobs are run one after another in this
+            process instead.
+    Returns:
+        A dictionary mapping the name of each job to what its function
+        returned, in the same order as the jobs.
+    """
+    # Run the jobs in this process when there is nothing to run at once
+    if max_workers == 1 or len(jobs) <= 1:
+        return {name: function(*args) for name, (function, args) in jobs.items()}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Start every job before waiting on any of them
+        futures = {name: executor.submit(function, *args)
+                   for name, (function, args) in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
 def merge_dataframes(df_list, output_path=None, method="left",
-    merge_on="Country"):
+    merge_on="Country", reconcile=False, backend="pandas"):
     """
     Merge all dataframes in a list into one master dataframe by country.
 
@@ -389,14 +509,26 @@ def merge_dataframes(df_list, output_path=None, method="left",
             merge_on: a string representing what will used as the how arg for
                 the pandas DataFrame merge() function (default: is "Country" meaning pandas
                 will combine rows that have the same value in their column labeled "Country")
+            reconcile: whether to first rename keys that are spelled differently
+                than in the first dataframe (e.g. "Cote d'Ivoire" and "Ivory Coast")
+                to its spelling using match_helpers.reconcile_keys (default: False)
+            backend: a string representing the dataframe library to merge
+                with, one of backend_helpers.BACKENDS (default: "pandas")
         Returns:
             The merged dataframe.s
     """
-    # Initialize the master dataframe
-    total = df_list[0]
-    # Starting from the second, merge each dataframe into the ones before.
-    for data_frame in df_list[1:]:
-        total = total.merge(data_frame, how=method, left_on=merge_on, right_on=merge_on)
+    # Match keys that are spelled differently in each dataframe
+    if reconcile:
+        df_list, _ = reconcile_keys(df_list, merge_on)
+    if backend != "pandas":
+        # Merge with Polars or DuckDB, keeping the rows in the same order
+        total = backend_function("merge_dataframes", backend)(df_list, method, merge_on)
+    else:
+        # Initialize the master dataframe
+        total = df_list[0]
+        # Starting from the second, merge each dataframe into the ones before.
+        for data_frame in df_list[1:]:
+            total = total.merge(data_frame, how=method, left_on=merge_on, right_on=merge_on)
 
     # If a location to save a csv is given, save it there
     if output_path is not None:
@@ -405,28 +537,32 @@ def merge_dataframes(df_list, output_path=None, method="left",
     return total
 
 
-def pivot(data_frame):
+def pivot(data_frame, backend="pandas"):
     """
     Pivot olympic dataframe into clean dataframe.
 
+    Every column named "<Type>-<Year>" (e.g. "Gold-2004" or "Rank-2004") is
+    pivoted, so any number of years and any added metrics are kept.
+
     Args:
         data_frame: pandas dataframe containing olympic data
+        backend: a string representing the dataframe library to pivot with,
+            one of backend_helpers.BACKENDS (default: "pandas")
     Returns:
         A dataframe containing the cleaned olympics data.
     """
+    # pivoting with Polars or DuckDB if asked to
+    if backend != "pandas":
+        return backend_function("pivot", backend)(data_frame)
+    # finding every column that belongs to a year
+    year_columns = [column for column in data_frame.columns
+                    if re.fullmatch(r".+-\d{4}", str(column))]
     # creating new dataframe
     new_data = (
         data_frame
         # creating variable column with names of column and values to new column
         >> gr.tf_pivot_longer(
-            columns=["Gold-2004", "Silver-2004", "Bronze-2004", "Total-2004",
-                "GDP-2004", "Pop-2004", "Athletes-2004",
-                "Gold-2008", "Silver-2008", "Bronze-2008", "Total-2008",
-                "GDP-2008", "Pop-2008", "Athletes-2008",
-                "Gold-2012","Silver-2012", "Bronze-2012", "Total-2012",
-                "GDP-2012", "Pop-2012", "Athletes-2012",
-                "Gold-2016", "Silver-2016", "Bronze-2016", "Total-2016",
-                "GDP-2016", "Pop-2016", "Athletes-2016"],
+            columns=year_columns,
             names_to=("Var"),
             values_to="val",
         )
@@ -443,42 +579,381 @@ def pivot(data_frame):
         )
     )
     # creating success rate column for new dataframe
-    new_data["Success Rate"] = new_data["Total"]/new_data["Athletes"]
+    new_data = derive_metrics(new_data, ["Success Rate"])
     return new_data
 
 
-def average_data(data_frame):
+def get_years(data_frame):
+    """
+    Find every olympic year contained in a wide or pivoted dataframe.
+
+    Args:
+        data_frame: pandas dataframe containing olympic data, either wide (with
+            columns such as "Total-2004") or pivoted (with a "Year" column)
+    Returns:
+        A sorted list of strings representing the years in the dataframe.
+    """
+    # Pivoted dataframes keep the year in its own column
+    if "Year" in data_frame.columns:
+        return sorted({str(year) for year in data_frame["Year"]})
+    # Wide dataframes keep the year at the end of each column name
+    years = set()
+    for column in data_frame.columns:
+        match = re.fullmatch(r".+-(\d{4})", str(column))
+        if match is not None:
+            years.add(match.group(1))
+    return sorted(years)
+
+
+def rank_medals(data_frame, methods=("gold", "total", "weighted"), ties="min"):
+    """
+    Rank the countries in a wide medal dataframe for every year at once.
+
+    For each method, the medal counts of every year are flattened into one
+    block and sorted with a single numpy lexsort, using the year as the first
+    sort key. Ties are found by comparing each sorted row with the one before
+    it. Countries with missing medal counts for a year are not ranked in it.
+
+    Args:
+        data_frame: wide pandas dataframe containing medal data (with columns
+            such as "Gold-2004")
+        methods: a list of names of methods in RANKING_METHODS to rank by
+            (default: "gold" for the official gold-first ranking, "total" for
+            total-first, and "weighted" for 3/2/1 medal points)
+        ties: a string that is "min" if tied countries share the highest rank
+            and the following rank is skipped (as in the official medal table),
+            or "dense" if the following rank is not skipped
+    Returns:
+        A copy of the dataframe with rank columns for each method and year
+        (e.g. "Rank-2004") and rank change columns for each year after the
+        first (e.g. "Rank Change-2008"). Rank changes are the previous rank
+        minus the current one, so moving up the table is positive.
+    """
+    new_columns = {}
+    for method in methods:
+        rank_name, keys = RANKING_METHODS[method]
+        # Only rank years that have all of the medal columns the keys use
+        missing_keys = [key for key in keys if key in METRICS]
+        needed = [key for key in keys if key not in METRICS]
+        for key in missing_keys:
+            needed += sorted(expression_metrics(METRICS[key]))
+        years = [year for year in get_years(data_frame)
+                 if all(f"{name}-{year}" in data_frame.columns for name in needed)]
+        # Compute any derived metrics that are used as ranking keys for those
+        # years
+        ranked_data = derive_metrics(
+            data_frame[[f"{name}-{year}" for name in dict.fromkeys(needed) for year in years]],
+            missing_keys)
+        num_countries = len(ranked_data)
+        num_years = len(years)
+
+        # Build a (key, year * country) block with the years one after another
+        block = np.stack([
+            ranked_data[[f"{key}-{year}" for year in years]].to_numpy(dtype=float).T.ravel()
+            for key in keys])
+        year_index = np.repeat(np.arange(num_years), num_countries)
+        missing = np.isnan(block).any(axis=0)
+
+        # Sort by year, then missing values last, then each key in descending
+        # order (np.lexsort uses the last key as the primary one)
+        order = np.lexsort([-block[i] for i in reversed(range(len(keys)))]
+                           + [missing, year_index])
+        sorted_block = block[:, order]
+        sorted_years = year_index[order]
+
+        # A new group of tied countries starts at each new year or each change
+        # in any of the keys
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = ((sorted_years[1:] != sorted_years[:-1])
+                         | (sorted_block[:, 1:] != sorted_block[:, :-1]).any(axis=0))
+        year_start = sorted_years * num_countries
+        if ties == "dense":
+            group_number = np.cumsum(new_group)
+            sorted_rank = group_number - group_number[year_start] + 1
+        else:
+            group_start = np.maximum.accumulate(
+                np.where(new_group, np.arange(len(order)), 0))
+            sorted_rank = group_start - year_start + 1
+
+        # Put the ranks back in the original order
+        rank = np.empty(len(order))
+        rank[order] = sorted_rank
+        rank[missing] = np.nan
+        rank = rank.reshape(num_years, num_countries)
+        for i, year in enumerate(years):
+            new_columns[f"{rank_name}-{year}"] = rank[i]
+            if i > 0:
+                new_columns[f"{rank_name} Change-{year}"] = rank[i - 1] - rank[i]
+
+    # Add all of the new columns to the dataframe at once
+    new_data = data_frame.drop(columns=list(new_columns), errors="ignore")
+    new_columns = pd.DataFrame(new_columns, index=data_frame.index)
+    return pd.concat([new_data, new_columns], axis=1)
+
+
+def expression_metrics(expression):
+    """
+    Find the base metrics used by the expression of a derived metric.
+
+    Args:
+        expression: a string representing an expression over the base metrics
+            (e.g. "Total / Pop * 1e6")
+    Returns:
+        A set of the names of the metrics that the expression uses.
+    """
+    tree = ast.parse(expression, mode="eval")
+    # Names of functions (such as log) are not metrics
+    functions = {node.func for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    return {node.id for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and node not in functions}
+
+
+def derive_metrics(data_frame, metrics=None):
+    """
+    Add derived metric columns (such as medals per million people) to a wide
+    or pivoted olympic dataframe.
+
+    The base metrics that the expressions use are gathered into one
+    country-by-year block per metric, so each expression is evaluated once for
+    every edition at the same time. When numexpr is installed, pandas.eval
+    evaluates each expression in a single fused pass without temporary
+    columns. All new columns are added to the dataframe at once.
+
+    Args:
+        data_frame: pandas dataframe containing olympic data, either wide (with
+            columns such as "Total-2004") or pivoted (with a "Year" column)
+        metrics: a list of names of metrics in METRICS, or a dictionary mapping
+            new metric names to expressions over the base metrics (default:
+            every metric in METRICS)
+    Returns:
+        A copy of the dataframe with a column added for each metric. Wide
+        dataframes get one column per metric and year (e.g. "Gold
+        Share-2004"), pivoted dataframes get one column per metric.
+    """
+    # Look up the expressions of metrics that were given by name
+    if metrics is None:
+        metrics = list(METRICS)
+    if not isinstance(metrics, dict):
+        metrics = {name: METRICS[name] for name in metrics}
+
+    # Find the base metrics that are used by any of the expressions
+    used = set()
+    for expression in metrics.values():
+        used.update(expression_metrics(expression))
+
+    pivoted = "Year" in data_frame.columns
+    years = get_years(data_frame)
+    # Gather each base metric into a single block covering every year
+    blocks = {}
+    for name in used:
+        if pivoted:
+            blocks[name] = pd.to_numeric(data_frame[name]).to_numpy(dtype=float)
+        else:
+            columns = [f"{name}-{year}" for year in years]
+            blocks[name] = data_frame[columns].to_numpy(dtype=float)
+
+    # Evaluate each expression once over the blocks of every year
+    new_columns = {}
+    for name, expression in metrics.items():
+        result = pd.eval(expression, local_dict=blocks)
+        if pivoted:
+            new_columns[name] = result
+        else:
+            for i, year in enumerate(years):
+                new_columns[f"{name}-{year}"] = result[:, i]
+
+    # Add all of the new columns to the dataframe at once
+    new_data = data_frame.drop(columns=list(new_columns), errors="ignore")
+    new_columns = pd.DataFrame(new_columns, index=data_frame.index)
+    return pd.concat([new_data, new_columns], axis=1)
+
+
+def average_data(data_frame, backend="pandas"):
     """
     Creating averages dataframe from olympics data
 
     Args:
         data_frame: pandas dataframe containing olympic data
+        backend: a string representing the dataframe library to average with,
+            one of backend_helpers.BACKENDS (default: "pandas")
+    Returns:
+        A dataframe containing the averages of the olympics data.
+    """
+    # averaging with Polars or DuckDB if asked to
+    if backend != "pandas":
+        return backend_function("average_data", backend)(data_frame)
+    # averaging all years from their running sums
+    return averages_from_aggregates(aggregate_data(data_frame))
+
+
+def aggregate_data(data_frame):
+    """
+    Create the running sums that the averages of olympics data are computed
+    from, so that they can be updated one edition at a time.
+
+    Args:
+        data_frame: wide pandas dataframe containing olympic data
+    Returns:
+        A dataframe with a "Country" column, a "Sum <Metric>" column for each
+        metric in AVERAGED_METRICS, and an "Editions" column counting the years
+        summed. A sum is missing if the metric is missing for any year.
+    """
+    aggregates = pd.DataFrame()
+    aggregates["Country"] = data_frame["Country"]
+    years = get_years(data_frame)
+    for metric in AVERAGED_METRICS:
+        # adding the years one after another
+        total = data_frame[f"{metric}-{years[0]}"]
+        for year in years[1:]:
+            total = total + data_frame[f"{metric}-{year}"]
+        aggregates[f"Sum {metric}"] = total
+    aggregates["Editions"] = len(years)
+    return aggregates
+
+
+def averages_from_aggregates(aggregates):
+    """
+    Compute the averages of olympics data from their running sums.
+
+    Args:
+        aggregates: dataframe of running sums created by aggregate_data
     Returns:
         A dataframe containing the averages of the olympics data.
     """
     # creating new dataframe
     new_data = pd.DataFrame()
     # setting country column as index
-    new_data["Country"] = data_frame["Country"]
-    # averaging all years and setting it to a new column
-    new_data["Average Total"] = (data_frame["Total-2004"] +
-                                    data_frame["Total-2008"] +
-                                    data_frame["Total-2012"] +
-                                    data_frame["Total-2016"]) / 4
-
-    new_data["Average GDP"] = (data_frame["GDP-2004"] +
-                                    data_frame["GDP-2008"] +
-                                    data_frame["GDP-2012"] +
-                                    data_frame["GDP-2016"]) / 4
-
-    # multiplying by 1000 to standardize population
-    new_data["Average Pop"] = (data_frame["Pop-2004"] +
-                                    data_frame["Pop-2008"] +
-                                    data_frame["Pop-2012"] +
-                                    data_frame["Pop-2016"]) / 4
-
-    new_data["Average Athletes"] = (data_frame["Athletes-2004"] +
-                                    data_frame["Athletes-2008"] +
-                                    data_frame["Athletes-2012"] +
-                                    data_frame["Athletes-2016"]) / 4
+    new_data["Country"] = aggregates["Country"]
+    # dividing each running sum by the number of years it covers
+    for metric in AVERAGED_METRICS:
+        new_data[f"Average {metric}"] = aggregates[f"Sum {metric}"] / aggregates["Editions"]
     return new_data
+
+
+def scrape_edition(year, edition):
+    """
+    Scrape the medal table and athlete counts of a single olympic games.
+
+    Args:
+        year: a string representing the year of the olympic games
+        edition: a dictionary with the same keys as the values of EDITIONS
+    Returns:
+        A list of the medal table and the athlete table for that year.
+    """
+    medals = scrape_medal_table(edition["medal_page"], year, edition["host"])
+    athletes = scrape_athlete_table(edition["athlete_page"], edition["athlete_table"], year)
+    return [medals, athletes]
+
+
+def append_edition(merged, tables, aggregates=None, output_path=None,
+                   aggregates_path=None):
+    """
+    Add a new olympic games to the merged dataset and its running sums without
+    recomputing the years that are already there.
+
+    As with scrape_medal_data, only countries that medalled in every year are
+    kept, while the other tables (athletes, GDP, population) are left merged.
+
+    Args:
+        merged: wide pandas dataframe containing the merged olympic data
+        tables: a list of dataframes for the new year, starting with its medal
+            table (e.g. from scrape_edition), followed by tables with the
+            year's other columns (e.g. "GDP-2020", "Pop-2020")
+        aggregates: dataframe of running sums of the merged data, as created
+            by aggregate_data or a previous call (optional, computed from the
+            merged data if not given)
+        output_path: name of file that the merged dataframe will save to
+            (optional).
+        aggregates_path: name of file that the running sums will save to
+            (optional).
+    Returns:
+        A tuple of the merged dataframe and the running sums with the new year
+        added. Averages can be computed with averages_from_aggregates.
+    """
+    if aggregates is None:
+        aggregates = aggregate_data(merged)
+    # Scraped tables (e.g. athlete counts) hold their numbers as strings
+    tables = [table.assign(**{column: pd.to_numeric(table[column], errors="coerce")
+                              for column in table.columns
+                              if re.fullmatch(r".+-\d{4}", str(column))})
+              for table in tables]
+
+    # Only keep countries that also medalled in the new year
+    merged = merge_dataframes([merged, tables[0]], method="inner")
+    merged = merge_dataframes([merged] + list(tables[1:]))
+    aggregates = merge_dataframes([merged[["Country"]], aggregates])
+
+    # Add the new year to each running sum
+    year = get_years(tables[0])[0]
+    for metric in AVERAGED_METRICS:
+        aggregates[f"Sum {metric}"] = (aggregates[f"Sum {metric}"]
+                                       + merged[f"{metric}-{year}"])
+    aggregates["Editions"] = aggregates["Editions"] + 1
+
+    # If a location to save a csv is given, save it there
+    if output_path is not None:
+        merged.to_csv(output_path, index=False)
+    if aggregates_path is not None:
+        aggregates.to_csv(aggregates_path, index=False)
+    return merged, aggregates
+
+
+def fingerprint(data_frame):
+    """
+    Compute a short fingerprint of a dataframe that changes whenever its
+    values, index, or columns change.
+
+    Args:
+        data_frame: pandas dataframe to fingerprint
+    Returns:
+        A string of hexadecimal digits identifying the version of the data.
+    """
+    digest = hashlib.sha1()
+    # Hash the column names and types as well as every row
+    digest.update(repr(list(data_frame.columns)).encode("utf-8"))
+    digest.update(repr(list(data_frame.dtypes.astype(str))).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data_frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def new_cache():
+    """
+    Create an empty least recently used cache for cache_get and cache_put.
+
+    Returns:
+        An empty OrderedDict, ordered from least to most recently used.
+    """
+    return OrderedDict()
+
+
+def cache_get(cache, key):
+    """
+    Look up a key in a least recently used cache, marking it as recently used.
+
+    Args:
+        cache: OrderedDict created by new_cache
+        key: hashable key to look up
+    Returns:
+        The cached value, or None if the key is not in the cache.
+    """
+    if key not in cache:
+        return None
+    cache.move_to_end(key)
+    return cache[key]
+
+
+def cache_put(cache, key, value, max_size=128):
+    """
+    Add a value to a least recently used cache, evicting the least recently
+    used entries once the cache is full.
+
+    Args:
+        cache: OrderedDict created by new_cache
+        key: hashable key to store the value under
+        value: the value to cache
+        max_size: the most entries to keep in the cache (default: 128)
+    """
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
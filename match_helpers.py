@@ -0,0 +1,251 @@
+"""
+Functions for matching country names that are spelled differently in
+different sources.
+"""
+
+import heapq  # library for finding the candidates that share the most n-grams
+import re  # regex library for cleaning up names
+import unicodedata  # library for removing accents from names
+from collections import defaultdict  # library for building the n-gram index
+import pandas as pd  # library for data analysis
+
+# Names that are too different to match by spelling. Each normalized name
+# (see normalize_name) maps to the normalized name it should be treated as.
+COUNTRY_ALIASES = {
+    "cote divoire": "ivory coast",
+    "swaziland": "eswatini",
+    "macedonia": "north macedonia",
+    "former yugoslav republic of macedonia": "north macedonia",
+    "czechia": "czech republic",
+    "united kingdom": "great britain",
+    "taiwan": "chinese taipei",
+    "korea republic of": "south korea",
+    "republic of korea": "south korea",
+    "korea democratic peoples republic of": "north korea",
+    "dpr korea": "north korea",
+    "east timor": "timorleste",
+    "burma": "myanmar",
+}
+
+
+def normalize_name(name, aliases=None):
+    """
+    Put a name into a standard form for matching by removing accents,
+    punctuation, case, and a leading "the".
+
+    Args:
+        name: a string representing a country name
+        aliases: a dictionary mapping normalized names to the normalized names
+            they should be treated as (default: COUNTRY_ALIASES)
+    Returns:
+        The normalized name as a string.
+    """
+    if aliases is None:
+        aliases = COUNTRY_ALIASES
+    # Split accented letters into the letter and the accent, then drop accents
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = re.sub(r"[^a-z0-9 ]", "", name.lower())
+    name = re.sub(r"\s+", " ", name).strip()
+    name = re.sub(r"^the ", "", name)
+    return aliases.get(name, name)
+
+
+def ascii_name(name):
+    """
+    Remove every letter that is not ASCII from a name, as scrape_athlete_table
+    does, and then normalize it.
+
+    Args:
+        name: a string representing a country name
+    Returns:
+        The name without non-ASCII letters, normalized with normalize_name.
+    """
+    return normalize_name(str(name).encode("ascii", "ignore").decode("ascii"))
+
+
+def edit_distance(first, second, max_distance=None):
+    """
+    Count the fewest single-letter insertions, deletions, and substitutions
+    needed to turn one string into another (the Levenshtein distance).
+
+    When max_distance is given, only the letters that are at most that far
+    from the diagonal are compared, since any path through the others is
+    already too long.
+
+    Args:
+        first: the first string
+        second: the second string
+        max_distance: stop early once the distance is known to be larger than
+            this (optional)
+    Returns:
+        The edit distance as an int, or max_distance + 1 if it was larger than
+        max_distance.
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    if max_distance is None:
+        max_distance = len(first)
+    if len(first) - len(second) > max_distance:
+        return max_distance + 1
+    # Distances larger than max_distance are all stored as max_distance + 1
+    too_far = max_distance + 1
+    previous = [min(j, too_far) for j in range(len(second) + 1)]
+    for i, first_char in enumerate(first, 1):
+        current = [min(i, too_far)] + [too_far] * len(second)
+        start = max(1, i - max_distance)
+        for j in range(start, min(len(second), i + max_distance) + 1):
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + (first_char != second[j - 1]),
+                             too_far)
+        # No later row can be smaller than the smallest value in this one
+        if min(current[start - 1:]) > max_distance:
+            return too_far
+        previous = current
+    return previous[-1]
+
+
+def ngrams(name, size=3):
+    """
+    Split a name into its overlapping groups of letters.
+
+    Args:
+        name: a string representing a normalized name
+        size: number of letters in each group (default: 3)
+    Returns:
+        A set of the strings of each group of letters.
+    """
+    padded = f" {name} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+def match_keys(keys, candidates, threshold=0.8, max_candidates=10, max_postings=300):
+    """
+    Propose a match among the candidates for each key that has no exact match.
+
+    Names are first compared after normalizing them (see normalize_name and
+    ascii_name). The remaining keys are only compared to candidates found by
+    n-gram blocking. A name within the largest edit distance that could still
+    reach the threshold shares all but a few of the key's groups of three
+    letters, so it must share one of the key's rarest groups, and only the
+    candidates listed under those groups are looked at (prefix filtering).
+    Groups listed under more than max_postings candidates (such as the "ia "
+    ending) are skipped, so the work for each key stays the same as the
+    number of candidates grows. Edit distances are only computed to the
+    candidates of a similar length that share the most of these groups. Each
+    candidate is matched to at most one key, best matches first.
+
+    Args:
+        keys: a list of the names that need a match
+        candidates: a list of the names that can be matched to
+        threshold: the lowest similarity (1 minus the edit distance divided by
+            the length of the longer name) to accept as a match (default: 0.8)
+        max_candidates: the most candidates to compute edit distances to for
+            each key (default: 10)
+        max_postings: the most candidates a group of letters can be listed
+            under and still be used to find candidates, unless it is the
+            key's rarest group (default: 300)
+    Returns:
+        A dataframe of proposed matches with "Key", "Match", and "Similarity"
+        columns, from most to least similar.
+    """
+    candidates = list(dict.fromkeys(candidates))
+    exact = set(candidates)
+    # Index the candidates by their normalized forms and their n-grams
+    by_name = {}
+    normalized = {}
+    lengths = {}
+    index = defaultdict(list)
+    for candidate in candidates:
+        normalized[candidate] = normalize_name(candidate)
+        lengths[candidate] = len(normalized[candidate])
+        for name in (normalized[candidate], ascii_name(candidate)):
+            by_name.setdefault(name, candidate)
+        for gram in ngrams(normalized[candidate]):
+            index[gram].append(candidate)
+
+    proposals = []
+    for key in dict.fromkeys(keys):
+        if key in exact:
+            continue
+        name = normalize_name(key)
+        # Names that are the same once normalized are perfect matches
+        if name in by_name or ascii_name(key) in by_name:
+            proposals.append((key, by_name.get(name, by_name.get(ascii_name(key))), 1.0))
+            continue
+        # The largest edit distance to any name that could reach the threshold
+        # (a match can be longer than the key by at most that distance)
+        key_distance = int(len(name) * (1 - threshold) / threshold + 1e-9)
+        # Each edit changes at most three groups, so a match shares at least
+        # one of the key's 3 * key_distance + 1 rarest groups
+        rarest = sorted(ngrams(name), key=lambda gram: len(index.get(gram, [])))
+        prefix = rarest[:3 * key_distance + 1]
+        prefix = prefix[:1] + [gram for gram in prefix[1:]
+                               if len(index.get(gram, [])) <= max_postings]
+        shared = defaultdict(int)
+        for gram in prefix:
+            for candidate in index.get(gram, []):
+                shared[candidate] += 1
+        # Only compute distances to the candidates of a similar length that
+        # share the most groups
+        best = heapq.nlargest(
+            max_candidates,
+            (candidate for candidate in shared
+             if abs(lengths[candidate] - len(name)) <= key_distance),
+            key=shared.get)
+        for candidate in best:
+            candidate_name = normalized[candidate]
+            longest = max(len(name), len(candidate_name), 1)
+            # Stop computing distances that are too large to be a match
+            max_distance = int(longest * (1 - threshold) + 1e-9)
+            distance = edit_distance(name, candidate_name, max_distance)
+            if distance <= max_distance:
+                proposals.append((key, candidate, 1 - distance / longest))
+
+    # Match each key and candidate at most once, most similar first
+    proposals.sort(key=lambda proposal: -proposal[2])
+    matched_keys, matched_candidates, matches = set(), set(), []
+    for key, candidate, similarity in proposals:
+        if key not in matched_keys and candidate not in matched_candidates:
+            matched_keys.add(key)
+            matched_candidates.add(candidate)
+            matches.append((key, candidate, similarity))
+    return pd.DataFrame(matches, columns=["Key", "Match", "Similarity"])
+
+
+def reconcile_keys(df_list, merge_on="Country", threshold=0.8, apply=True):
+    """
+    Match the keys of each dataframe that have no exact match in the first
+    dataframe to the first dataframe's spelling.
+
+    Args:
+        df_list: a list of dataframes that will be merged
+        merge_on: name of the column holding the keys (default: "Country")
+        threshold: the lowest similarity to accept as a match (default: 0.8)
+        apply: whether to rename the matched keys (default: True)
+    Returns:
+        A tuple of the list of dataframes (with matched keys renamed to the
+        first dataframe's spelling if apply is True) and a dataframe of the
+        matches with "Table", "Key", "Match", and "Similarity" columns.
+    """
+    reference = set(df_list[0][merge_on].dropna())
+    new_list = [df_list[0]]
+    all_matches = []
+    for number, data_frame in enumerate(df_list[1:], 1):
+        # Only match keys that are missing from the first dataframe to keys of
+        # the first dataframe that are not matched yet
+        keys = data_frame[merge_on].dropna().tolist()
+        unmatched = sorted(reference - set(keys))
+        missing = [key for key in keys if key not in reference]
+        matches = match_keys(missing, unmatched, threshold)
+        matches.insert(0, "Table", number)
+        all_matches.append(matches)
+        if apply:
+            renames = dict(zip(matches["Key"], matches["Match"]))
+            keys = data_frame[merge_on]
+            data_frame = data_frame.assign(**{merge_on: keys.map(renames).fillna(keys)})
+        new_list.append(data_frame)
+    all_matches = pd.concat(all_matches, ignore_index=True) if all_matches else pd.DataFrame(
+        columns=["Table", "Key", "Match", "Similarity"])
+    return new_list, all_matches
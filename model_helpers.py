@@ -0,0 +1,552 @@
+"""
+Functions for fitting, comparing, and checking models of olympics data.
+"""
+
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+import patsy  # library for turning formulas into design matrices
+from scipy import stats  # library for statistical distributions
+
+from helpers import cache_get, cache_put, fingerprint, new_cache, run_jobs
+from shared_helpers import to_block
+
+# Correlation matrices that have already been computed, keyed by the version
+# of the data they were computed from
+CORRELATION_CACHE = new_cache()
+
+
+def build_design(data_frame, formulas, eval_env=0):
+    """
+    Build one design matrix holding every column used by any of the formulas.
+
+    Each factor (such as np.log(GDP) or C(Year)) is evaluated only once, even
+    if many formulas use it, but each formula's terms are coded on their own,
+    so categorical terms and interactions get the same columns as when the
+    formula is fit by itself. Columns that are the same in several formulas
+    are only stored once. Rows with missing values in any column used by any
+    formula are dropped, so every formula is fit to the same rows and their
+    fit statistics can be compared.
+
+    Args:
+        data_frame: pandas dataframe containing information
+        formulas: a list of strings representing patsy formulas (e.g.
+            "Total ~ np.log(GDP) + np.log(Pop)")
+        eval_env: how many frames up from the caller to look up names such as
+            np, or a patsy EvalEnvironment (default: 0, the caller)
+    Returns:
+        A tuple of the design matrix as a numpy array and a dictionary mapping
+        each formula to a tuple of the column number of its response and a
+        list of the column numbers of its predictors.
+    """
+    if isinstance(eval_env, int):
+        eval_env = patsy.EvalEnvironment.capture(eval_env + 1)
+    descriptions = [patsy.ModelDesc.from_formula(formula) for formula in formulas]
+    termlists = [termlist for description in descriptions
+                 for termlist in (description.lhs_termlist, description.rhs_termlist)]
+    # Code each formula's response and predictors separately, evaluating the
+    # factors they share once for all of them
+    design_infos = patsy.design_matrix_builders(termlists, lambda: iter([data_frame]),
+                                                eval_env)
+    matrices = patsy.build_design_matrices(design_infos, data_frame)
+
+    # Keep one copy of each column, found by its name
+    names, values, columns = {}, [], {}
+    numbers = []
+    for matrix in matrices:
+        matrix_numbers = []
+        for name, column in zip(matrix.design_info.column_names, np.asarray(matrix).T):
+            if name not in names:
+                names[name] = len(values)
+                values.append(column)
+            matrix_numbers.append(names[name])
+        numbers.append(matrix_numbers)
+    for i, formula in enumerate(formulas):
+        columns[formula] = (numbers[2 * i][0], numbers[2 * i + 1])
+    return np.column_stack(values), columns
+
+
+def fit_least_squares(y_values, x_values, folds=None):
+    """
+    Fit an ordinary least squares model and compute the fit statistics used to
+    compare models, matching those of statsmodels.
+
+    Args:
+        y_values: numpy array of the response
+        x_values: 2D numpy array of the predictors
+        folds: numpy array giving the cross-validation fold number of each row
+            (optional, cross-validation is skipped if not given)
+    Returns:
+        A dictionary of the number of observations, number of parameters,
+        R-squared, AIC, BIC, and mean squared cross-validation error.
+    """
+    nobs = len(y_values)
+    params, _, rank, _ = np.linalg.lstsq(x_values, y_values, rcond=None)
+    ssr = float(np.sum((y_values - x_values @ params) ** 2))
+    # A model with an intercept is compared to the mean, otherwise to zero. As
+    # in statsmodels, predictors that add up to a constant (such as a dummy
+    # for every year) count as an intercept
+    with_constant = np.column_stack([x_values, np.ones(nobs)])
+    has_intercept = np.linalg.matrix_rank(with_constant) == rank
+    centered = y_values - y_values.mean() if has_intercept else y_values
+    log_likelihood = -nobs / 2 * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1)
+
+    cv_error = np.nan
+    if folds is not None:
+        squared_errors = []
+        for fold in np.unique(folds):
+            test = folds == fold
+            fold_params = np.linalg.lstsq(x_values[~test], y_values[~test], rcond=None)[0]
+            squared_errors.append((y_values[test] - x_values[test] @ fold_params) ** 2)
+        cv_error = float(np.mean(np.concatenate(squared_errors)))
+
+    return {"Observations": nobs,
+            "Parameters": int(rank),
+            "R-squared": 1 - ssr / float(np.sum(centered ** 2)),
+            "AIC": -2 * log_likelihood + 2 * rank,
+            "BIC": -2 * log_likelihood + rank * np.log(nobs),
+            "CV Error": cv_error}
+
+
+def fit_candidates(design, columns, folds):
+    """
+    Fit a batch of candidate models that share one design matrix.
+
+    Args:
+        design: 2D numpy array returned by build_design
+        columns: dictionary mapping each formula to its response and predictor
+            column numbers, as returned by build_design
+        folds: numpy array giving the cross-validation fold number of each row
+    Returns:
+        A list of dictionaries of fit statistics, one for each formula.
+    """
+    results = []
+    for formula, (response, predictors) in columns.items():
+        result = fit_least_squares(design[:, response], design[:, predictors], folds)
+        result["Formula"] = formula
+        results.append(result)
+    return results
+
+
+def select_models(data_frame, formulas, rank_by="AIC", folds=5, by=None,
+                  max_workers=1, seed=0):
+    """
+    Fit many candidate formulas and rank them by how well they fit.
+
+    The design matrix is built once for all formulas (see build_design), every
+    formula uses the same cross-validation folds, and the formulas can be
+    split into batches that are fit in a process pool.
+
+    Args:
+        data_frame: pandas dataframe containing information
+        formulas: a list of strings representing patsy formulas to compare
+        rank_by: name of the column to sort by ("AIC", "BIC", "CV Error", or
+            "R-squared") (default: "AIC")
+        folds: number of cross-validation folds (default: 5)
+        by: name of a column (such as "Year") to also compare the formulas
+            within each of its values (optional, all rows are always used too)
+        max_workers: number of processes to fit batches of formulas in
+            (default: 1, meaning fit them in this process)
+        seed: seed for randomly assigning rows to folds (default: 0)
+    Returns:
+        A dataframe with one row per formula (and subset, if by is given),
+        sorted from best to worst fit.
+    """
+    # Look up names used in the formulas (such as np) where this was called
+    eval_env = patsy.EvalEnvironment.capture(1)
+    subsets = {"All": data_frame}
+    if by is not None:
+        for value, rows in data_frame.groupby(by):
+            subsets[str(value)] = rows
+
+    jobs = {}
+    for subset, rows in subsets.items():
+        design, columns = build_design(rows, formulas, eval_env)
+        # Assign rows to folds the same way for every formula
+        random = np.random.default_rng(seed)
+        fold_numbers = random.permutation(np.arange(len(design)) % folds)
+        # Split the formulas into one batch per worker
+        num_batches = 1 if max_workers == 1 else (max_workers or len(formulas))
+        for i in range(min(num_batches, len(formulas))):
+            batch = {formula: columns[formula] for formula in formulas[i::num_batches]}
+            used = sorted({column for response, predictors in batch.values()
+                           for column in [response] + predictors})
+            # Only send the columns that the batch uses to the worker
+            renumber = {column: j for j, column in enumerate(used)}
+            batch = {formula: (renumber[response], [renumber[p] for p in predictors])
+                     for formula, (response, predictors) in batch.items()}
+            jobs[(subset, i)] = (fit_candidates, (design[:, used], batch, fold_numbers))
+
+    rows = []
+    for (subset, _), results in run_jobs(jobs, max_workers).items():
+        for result in results:
+            result["Subset"] = subset
+            rows.append(result)
+    table = pd.DataFrame(rows, columns=["Formula", "Subset", "Observations", "Parameters",
+                                        "R-squared", "AIC", "BIC", "CV Error"])
+    ascending = rank_by != "R-squared"
+    return table.sort_values(rank_by, ascending=ascending, kind="stable").reset_index(drop=True)
+
+
+def demean(values, groups, tol=1e-10, max_iter=1000):
+    """
+    Subtract group means from each column, absorbing fixed effects without
+    building a column of dummies for every group.
+
+    With more than one grouping (such as countries and years), the group means
+    are subtracted one grouping after another until nothing changes, which
+    also works when some countries are missing some years.
+
+    Args:
+        values: 2D numpy array with one column per variable
+        groups: a list of integer numpy arrays giving the group of each row for
+            each grouping
+        tol: largest change in any value at which to stop (default: 1e-10)
+        max_iter: the most passes to make over the groupings (default: 1000)
+    Returns:
+        A 2D numpy array of the values with the group means removed.
+    """
+    values = np.array(values, dtype=float)
+    counts = [np.bincount(codes) for codes in groups]
+    for _ in range(max_iter):
+        largest_change = 0.0
+        for codes, count in zip(groups, counts):
+            for column in range(values.shape[1]):
+                means = np.bincount(codes, weights=values[:, column]) / count
+                values[:, column] -= means[codes]
+                largest_change = max(largest_change, float(np.max(np.abs(means))))
+        # One pass is always enough for a single grouping
+        if len(groups) == 1 or largest_change < tol:
+            break
+    return values
+
+
+def panel_ols(data_frame, formula, entity="Country", time="Year",
+              effects=("entity", "time"), cluster="Country"):
+    """
+    Fit a fixed effects panel regression to pivoted olympic data.
+
+    Country and year effects are absorbed by demeaning (see demean) instead of
+    adding dummy columns, so memory grows with the number of rows and
+    predictors rather than with the number of countries. The coefficients and
+    unclustered standard errors match an ordinary least squares fit with
+    C(Country) and C(Year) dummies.
+
+    Args:
+        data_frame: pivoted pandas dataframe containing olympic data
+        formula: a string representing a patsy formula of numeric predictors
+            (e.g. "Total ~ np.log(GDP) + np.log(Pop)"), without the fixed
+            effects
+        entity: name of the column identifying each country (default: "Country")
+        time: name of the column identifying each year (default: "Year")
+        effects: a list containing "entity", "time", or both, naming the fixed
+            effects to absorb (default: both)
+        cluster: name of the column to cluster standard errors by (default:
+            "Country"), or None for unclustered standard errors. The small
+            sample correction counts the absorbed effects as parameters, as
+            statsmodels does for the equivalent dummy model.
+    Returns:
+        A dictionary holding a dataframe of the "params" (with "Coefficient",
+        "Std Error", "t", and "P>|t|" columns), the number of observations
+        "nobs", the residual degrees of freedom "df_resid", and the within
+        R-squared "rsquared_within".
+    """
+    y_matrix, x_matrix = patsy.dmatrices(formula, data_frame, return_type="dataframe",
+                                         eval_env=patsy.EvalEnvironment.capture(1))
+    # The intercept is absorbed by the fixed effects
+    x_matrix = x_matrix.drop(columns=["Intercept"], errors="ignore")
+    rows = data_frame.loc[x_matrix.index]
+
+    groups = []
+    if "entity" in effects:
+        groups.append(pd.factorize(rows[entity])[0])
+    if "time" in effects:
+        groups.append(pd.factorize(rows[time])[0])
+    values = demean(np.column_stack([y_matrix.to_numpy(), x_matrix.to_numpy()]), groups)
+    y_values, x_values = values[:, 0], values[:, 1:]
+
+    nobs, num_params = x_values.shape
+    # Each absorbed grouping adds a parameter per group, less one for each
+    # grouping after the first because only one intercept can be absorbed
+    num_absorbed = sum(codes.max() + 1 for codes in groups) - max(len(groups) - 1, 0)
+    df_resid = nobs - num_params - num_absorbed
+
+    xtx_inv = np.linalg.inv(x_values.T @ x_values)
+    params = xtx_inv @ (x_values.T @ y_values)
+    residuals = y_values - x_values @ params
+
+    if cluster is None:
+        covariance = xtx_inv * float(residuals @ residuals) / df_resid
+    else:
+        clusters = pd.factorize(rows[cluster])[0]
+        num_clusters = clusters.max() + 1
+        # Sum the score of every row within each cluster
+        scores = np.zeros((num_clusters, num_params))
+        np.add.at(scores, clusters, x_values * residuals[:, None])
+        correction = (num_clusters / (num_clusters - 1)
+                      * (nobs - 1) / (nobs - num_params - num_absorbed))
+        covariance = correction * xtx_inv @ (scores.T @ scores) @ xtx_inv
+        df_resid = num_clusters - 1
+
+    std_errors = np.sqrt(np.diag(covariance))
+    t_values = params / std_errors
+    table = pd.DataFrame({"Coefficient": params,
+                          "Std Error": std_errors,
+                          "t": t_values,
+                          "P>|t|": 2 * stats.t.sf(np.abs(t_values), df_resid)},
+                         index=x_matrix.columns)
+    return {"params": table,
+            "nobs": nobs,
+            "df_resid": df_resid,
+            "rsquared_within": 1 - float(residuals @ residuals) / float(y_values @ y_values)}
+
+
+def pairwise_correlations(values):
+    """
+    Compute Pearson correlation matrices for many groups at once, using for
+    each pair of variables only the rows where both are present.
+
+    Args:
+        values: numpy array with shape (groups, rows, variables), with NaN
+            marking missing values
+    Returns:
+        A numpy array with shape (groups, variables, variables) of the
+        correlation of every pair of variables within each group.
+    """
+    present = (~np.isnan(values)).astype(float)
+    filled = np.where(present > 0, values, 0.0)
+    transposed = filled.transpose(0, 2, 1)
+    # Sums over the rows where both variables of each pair are present
+    count = present.transpose(0, 2, 1) @ present
+    sum_x = transposed @ present
+    sum_xx = (transposed ** 2) @ present
+    sum_xy = transposed @ filled
+    sum_y = sum_x.transpose(0, 2, 1)
+    sum_yy = sum_xx.transpose(0, 2, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ((count * sum_xy - sum_x * sum_y)
+                / np.sqrt((count * sum_xx - sum_x ** 2) * (count * sum_yy - sum_y ** 2)))
+
+
+def correlation_matrices(data_frame, metrics=None):
+    """
+    Compute the Pearson and Spearman correlation matrices of every pair of
+    metrics within each year, pooled over every year, and between the
+    averages of every year.
+
+    Every group is computed at once with matrix products (see
+    pairwise_correlations). Spearman correlations rank each metric over all
+    of its values in the group, so with missing values they can differ
+    slightly from ranking again for each pair. Results are cached by the
+    fingerprint of the data, so asking again for unchanged data is instant.
+
+    Args:
+        data_frame: wide pandas dataframe containing olympic data
+        metrics: a list of the metrics to correlate (default: every metric
+            that has a column for some year)
+    Returns:
+        A dataframe of correlations whose index has a "Method" level
+        ("pearson" or "spearman"), a "Group" level (each year, "Pooled", or
+        "Average"), and a "Metric" level, and whose columns are the metrics.
+        For example, result.loc[("pearson", "2008", "Total"), "GDP"].
+    """
+    key = (fingerprint(data_frame), None if metrics is None else tuple(metrics))
+    result = cache_get(CORRELATION_CACHE, key)
+    if result is not None:
+        return result.copy()
+
+    block, index = to_block(data_frame)
+    if metrics is None:
+        metrics = index["metrics"]
+    block = block[[index["metrics"].index(metric) for metric in metrics]]
+    # Rearrange to (groups, rows, metrics) for each year, pooled, and averaged
+    by_year = block.transpose(1, 2, 0)
+    groups = {"Year": by_year,
+              "Pooled": by_year.reshape(1, -1, len(metrics)),
+              "Average": by_year.mean(axis=0)[None]}
+    names = index["years"] + ["Pooled", "Average"]
+
+    frames = []
+    for method in ["pearson", "spearman"]:
+        matrices = []
+        for values in groups.values():
+            if method == "spearman":
+                # Rank each metric within each group, giving ties their average rank
+                flat = values.transpose(0, 2, 1).reshape(-1, values.shape[1])
+                ranks = pd.DataFrame(flat).rank(axis=1).to_numpy()
+                values = ranks.reshape(values.shape[0], values.shape[2], -1).transpose(0, 2, 1)
+            matrices.append(pairwise_correlations(values))
+        matrices = np.concatenate(matrices)
+        frame = pd.DataFrame(
+            matrices.reshape(-1, len(metrics)), columns=metrics,
+            index=pd.MultiIndex.from_product([[method], names, metrics],
+                                             names=["Method", "Group", "Metric"]))
+        frames.append(frame)
+    result = pd.concat(frames)
+    cache_put(CORRELATION_CACHE, key, result)
+    return result.copy()
+
+
+def ols_statistics(chunk, formula, eval_env=0):
+    """
+    Compute the sums that an ordinary least squares fit needs from one chunk
+    of data, so that chunks can be read and summed one at a time.
+
+    Only the means and the sums of products about the means are kept, so
+    their size depends on the number of predictors and not on the number of
+    rows, and they stay accurate when the columns are on very different
+    scales. The formula should only use numeric columns and transforms
+    without state (such as np.log), so that every chunk gets the same design
+    matrix columns.
+
+    Args:
+        chunk: pandas dataframe containing some of the rows
+        formula: a string representing a patsy formula
+        eval_env: how many frames up from the caller to look up names such as
+            np, or a patsy EvalEnvironment (default: 0, the caller)
+    Returns:
+        A dictionary of the predictor "columns", the number of rows "nobs",
+        the "means" of the predictors and then the response, and their
+        "comoments", the matrix of sums of products of their differences from
+        the means.
+    """
+    if isinstance(eval_env, int):
+        eval_env = patsy.EvalEnvironment.capture(eval_env + 1)
+    y_matrix, x_matrix = patsy.dmatrices(formula, chunk, eval_env=eval_env)
+    # Keep the response as the last column
+    values = np.column_stack([np.asarray(x_matrix), np.asarray(y_matrix)[:, 0]])
+    means = values.mean(axis=0)
+    centered = values - means
+    return {"columns": x_matrix.design_info.column_names,
+            "nobs": len(values),
+            "means": means,
+            "comoments": centered.T @ centered}
+
+
+def merge_ols_statistics(first, second):
+    """
+    Combine the sums from two chunks (or from two worker processes).
+
+    Args:
+        first: dictionary of sums returned by ols_statistics
+        second: dictionary of sums returned by ols_statistics
+    Returns:
+        A dictionary of the sums over the rows of both.
+    """
+    if first["columns"] != second["columns"]:
+        raise ValueError("The chunks have different design matrix columns: "
+                         f"{first['columns']} and {second['columns']}")
+    nobs = first["nobs"] + second["nobs"]
+    # Move both sets of sums to the means of all of the rows
+    difference = second["means"] - first["means"]
+    return {"columns": first["columns"],
+            "nobs": nobs,
+            "means": first["means"] + difference * second["nobs"] / nobs,
+            "comoments": (first["comoments"] + second["comoments"]
+                          + np.outer(difference, difference)
+                          * first["nobs"] * second["nobs"] / nobs)}
+
+
+def ols_from_statistics(statistics):
+    """
+    Fit an ordinary least squares model from the sums of ols_statistics,
+    giving the same results as statsmodels fit to every row at once.
+
+    Each predictor is scaled to the same size before solving, so predictors
+    on very different scales (such as population and athletes) do not lose
+    precision. With an intercept, the slopes are found from the sums about
+    the means and the intercept from the means.
+
+    Args:
+        statistics: dictionary of sums returned by ols_statistics or
+            merge_ols_statistics
+    Returns:
+        A dictionary holding a dataframe of the "params" (with "Coefficient",
+        "Std Error", "t", and "P>|t|" columns), and the "nobs", "df_resid",
+        "ssr", "rsquared", "rsquared_adj", "aic", and "bic" of the fit.
+    """
+    nobs = statistics["nobs"]
+    columns = statistics["columns"]
+    means = statistics["means"][:-1]
+    has_intercept = "Intercept" in columns
+    if has_intercept:
+        # Fit the slopes to the differences from the means
+        slopes = [i for i, column in enumerate(columns) if column != "Intercept"]
+        products = statistics["comoments"]
+    else:
+        # Fit to the sums of products of the values themselves
+        slopes = list(range(len(columns)))
+        products = (statistics["comoments"]
+                    + nobs * np.outer(statistics["means"], statistics["means"]))
+    xtx = products[np.ix_(slopes, slopes)]
+    xty = products[slopes, -1]
+    yty = products[-1, -1]
+
+    # Scale every predictor to have a sum of squares of one before inverting
+    scale = np.sqrt(np.diag(xtx))
+    scale[scale == 0] = 1
+    scaled_inv = np.linalg.pinv(xtx / np.outer(scale, scale))
+    slopes_inv = scaled_inv / np.outer(scale, scale)
+    slope_params = slopes_inv @ xty
+    rank = np.linalg.matrix_rank(xtx / np.outer(scale, scale)) + has_intercept
+    ssr = float(yty - 2 * slope_params @ xty + slope_params @ xtx @ slope_params)
+
+    # Put the intercept back with the other predictors
+    params = np.zeros(len(columns))
+    params[slopes] = slope_params
+    xtx_inv = np.zeros((len(columns), len(columns)))
+    xtx_inv[np.ix_(slopes, slopes)] = slopes_inv
+    if has_intercept:
+        intercept = columns.index("Intercept")
+        slope_means = means[slopes]
+        params[intercept] = statistics["means"][-1] - slope_means @ slope_params
+        xtx_inv[intercept, slopes] = xtx_inv[slopes, intercept] = -slopes_inv @ slope_means
+        xtx_inv[intercept, intercept] = 1 / nobs + slope_means @ slopes_inv @ slope_means
+
+    df_resid = nobs - rank
+    # A model with an intercept is compared to the mean, otherwise to zero
+    df_model = rank - 1 if has_intercept else rank
+    rsquared = 1 - ssr / yty
+    log_likelihood = -nobs / 2 * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1)
+
+    std_errors = np.sqrt(np.diag(xtx_inv) * ssr / df_resid)
+    t_values = params / std_errors
+    table = pd.DataFrame({"Coefficient": params,
+                          "Std Error": std_errors,
+                          "t": t_values,
+                          "P>|t|": 2 * stats.t.sf(np.abs(t_values), df_resid)},
+                         index=columns)
+    return {"params": table,
+            "nobs": nobs,
+            "df_resid": df_resid,
+            "ssr": ssr,
+            "rsquared": rsquared,
+            "rsquared_adj": 1 - (1 - rsquared) * (nobs - (rank - df_model)) / df_resid,
+            "aic": -2 * log_likelihood + 2 * rank,
+            "bic": -2 * log_likelihood + rank * np.log(nobs)}
+
+
+def streaming_ols(source, formula, chunksize=100000):
+    """
+    Fit an ordinary least squares model to data that is too large to load at
+    once by reading it in chunks and summing their statistics.
+
+    Args:
+        source: a string representing the filepath of a CSV, or an iterable of
+            pandas dataframes (such as the chunks of pd.read_csv)
+        formula: a string representing a patsy formula of numeric columns
+            (see ols_statistics)
+        chunksize: number of rows to read at a time from a CSV (default: 100000)
+    Returns:
+        The fit, as returned by ols_from_statistics.
+    """
+    eval_env = patsy.EvalEnvironment.capture(1)
+    if isinstance(source, str):
+        source = pd.read_csv(source, chunksize=chunksize)
+    statistics = None
+    for chunk in source:
+        chunk_statistics = ols_statistics(chunk, formula, eval_env)
+        if statistics is None:
+            statistics = chunk_statistics
+        else:
+            statistics = merge_ols_statistics(statistics, chunk_statistics)
+    return ols_from_statistics(statistics)
@@ -0,0 +1,112 @@
+"""
+Functions for measuring how much of the variance of fitted medal models is
+explained by each driver (GDP, population, and athletes), using grama's
+Sobol' indices.
+"""
+
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+import grama as gr  # library for building and sampling models
+
+from forecast_helpers import FORECAST_INPUTS, model_spec, predict_medals
+from helpers import run_jobs
+
+
+def sensitivity_model(spec, data_frame):
+    """
+    Build a grama model of fitted medal models whose inputs are distributed as
+    in the data.
+
+    Each input has a lognormal marginal fit to its values in the data, and the
+    inputs are independent, as Sobol' indices require.
+
+    Args:
+        spec: dictionary describing the fitted models, from
+            forecast_helpers.model_spec
+        data_frame: pivoted pandas dataframe containing the inputs in
+            FORECAST_INPUTS
+    Returns:
+        The grama model, with an output for each medal model.
+    """
+    marginals = {}
+    for name in FORECAST_INPUTS:
+        values = pd.to_numeric(data_frame[name]).astype(float)
+        values = values[np.isfinite(values) & (values > 0)]
+        marginals[name] = gr.marg_fit("lognorm", values, floc=0)
+    return (
+        gr.Model("Medal sensitivity")
+        >> gr.cp_vec_function(
+            fun=lambda df: predict_medals(spec, df).set_axis(df.index),
+            var=FORECAST_INPUTS,
+            out=list(spec),
+        )
+        >> gr.cp_marginals(**marginals)
+        >> gr.cp_copula_independence()
+    )
+
+
+def sensitivity_indices(data_frame, fits, num_samples=10000, plans=("first", "total"),
+                        batch_size=100000, max_workers=1, seed=0):
+    """
+    Estimate the Sobol' indices of each input of the fitted medal models, for
+    each year and for every year pooled.
+
+    For each subset of the data (each year and all years), the inputs are
+    given distributions fit to that subset (see sensitivity_model) and grama's
+    hybrid point design is drawn for each plan. Every model is evaluated on
+    the same design, so the samples are shared by all of the outputs. The
+    designs are split into batches that are evaluated with vectorized
+    predictions, and the batches can be run in a process pool.
+
+    Args:
+        data_frame: pivoted pandas dataframe containing olympic data (e.g.
+            from pivot)
+        fits: a list of fitted statsmodels OLS results of medal counts on the
+            inputs in FORECAST_INPUTS (e.g. from vis_helpers.fit_model). Their
+            formulas can use numpy as np.
+        num_samples: number of samples along each sweep of the design
+            (default: 10000)
+        plans: a list of the kinds of indices to estimate, "first" for
+            first-order indices and "total" for total-effect indices (default:
+            both)
+        batch_size: number of rows of a design evaluated at once (default:
+            100000)
+        max_workers: number of processes to evaluate batches in (default: 1,
+            meaning evaluate them one after another in this process)
+        seed: seed for drawing the designs (default: 0)
+    Returns:
+        A dataframe with a row for each subset ("Pooled" or a year), plan, and
+        input, and a column of the index for each medal model (e.g. "Total").
+    """
+    spec = model_spec(fits)
+    subsets = {"Pooled": data_frame}
+    for year, rows in data_frame.groupby(data_frame["Year"].astype(str)):
+        subsets[year] = rows
+
+    designs, jobs = {}, {}
+    for subset, rows in subsets.items():
+        model = sensitivity_model(spec, rows)
+        for plan in plans:
+            design = gr.eval_hybrid(model, n=num_samples, plan=plan, seed=seed, skip=True)
+            designs[(subset, plan)] = design
+            for start in range(0, len(design), batch_size):
+                jobs[(subset, plan, start)] = (
+                    predict_medals,
+                    (spec, design[FORECAST_INPUTS].iloc[start:start + batch_size]))
+    results = run_jobs(jobs, max_workers)
+
+    tables = []
+    for (subset, plan), design in designs.items():
+        outputs = pd.concat([results[(subset, plan, start)]
+                             for start in range(0, len(design), batch_size)],
+                            ignore_index=True)
+        # Add the outputs to the design itself, which keeps the description
+        # grama needs to compute the indices
+        for output in spec:
+            design[output] = outputs[output].to_numpy()
+        table = gr.tran_sobol(design, typename="Input", digits=6)
+        table["Input"] = table["Input"].str[len("S_"):]
+        table.insert(0, "Plan", plan)
+        table.insert(0, "Subset", subset)
+        tables.append(table[["Subset", "Plan", "Input"] + list(spec)])
+    return pd.concat(tables, ignore_index=True)
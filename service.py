@@ -0,0 +1,210 @@
+"""
+Local HTTP service that keeps the olympics datasets in memory and answers
+queries about them as JSON.
+
+Run it with:
+    python service.py --data data/medals_gdp_pop_athletes.csv --port 8000
+
+Endpoints:
+    GET /version                 version (fingerprint) of the loaded data
+    GET /countries/<country>     time series of one country
+    GET /years/<year>            cross section of every country in one year
+    GET /averages[?country=...]  averages over every year
+    GET /models?formula=...[&data=pivoted|averaged]
+                                 ordinary least squares fit of a formula
+"""
+
+import argparse  # library for command line arguments
+import asyncio  # library for asynchronous networking
+import json  # library for encoding responses
+import os  # library for checking when files change
+from urllib.parse import parse_qs, unquote, urlsplit  # library for parsing urls
+import pandas as pd  # library for data analysis
+
+from helpers import (
+    average_data,
+    cache_get,
+    cache_put,
+    fingerprint,
+    new_cache,
+    pivot
+)
+from vis_helpers import fit_model
+
+# Datasets that models can be fit to
+MODEL_DATA = ("pivoted", "averaged")
+
+
+def load_datasets(input_path):
+    """
+    Load the merged dataset and compute its pivoted and averaged versions.
+
+    Args:
+        input_path: a string representing the filepath of the CSV of the
+            merged dataset
+    Returns:
+        A dictionary holding the "merged", "pivoted" and "averaged"
+        dataframes, the "version" of the data, and the "path" and "mtime" of
+        the file it was loaded from.
+    """
+    merged = pd.read_csv(input_path)
+    return {"merged": merged,
+            "pivoted": pivot(merged),
+            "averaged": average_data(merged),
+            "version": fingerprint(merged),
+            "path": input_path,
+            "mtime": os.path.getmtime(input_path)}
+
+
+def refresh_datasets(datasets):
+    """
+    Reload the datasets if the file they were loaded from has changed.
+
+    Args:
+        datasets: dictionary returned by load_datasets
+    Returns:
+        The same dictionary if the file has not changed, otherwise newly loaded
+        datasets.
+    """
+    if os.path.getmtime(datasets["path"]) != datasets["mtime"]:
+        return load_datasets(datasets["path"])
+    return datasets
+
+
+def handle_request(datasets, target):
+    """
+    Answer a query to the service.
+
+    Args:
+        datasets: dictionary returned by load_datasets
+        target: a string representing the path and query of the request (e.g.
+            "/years/2008")
+    Returns:
+        A tuple of the HTTP status code and the JSON body as a string.
+    """
+    url = urlsplit(target)
+    parts = [unquote(part) for part in url.path.split("/") if part]
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+    if parts == ["version"]:
+        return 200, json.dumps({"version": datasets["version"]})
+    if len(parts) == 2 and parts[0] == "countries":
+        pivoted = datasets["pivoted"]
+        rows = pivoted[pivoted["Country"] == parts[1]]
+        if rows.empty:
+            return 404, json.dumps({"error": f"Unknown country: {parts[1]}"})
+        return 200, rows.to_json(orient="records")
+    if len(parts) == 2 and parts[0] == "years":
+        pivoted = datasets["pivoted"]
+        rows = pivoted[pivoted["Year"].astype(str) == parts[1]]
+        if rows.empty:
+            return 404, json.dumps({"error": f"Unknown year: {parts[1]}"})
+        return 200, rows.to_json(orient="records")
+    if parts == ["averages"]:
+        averaged = datasets["averaged"]
+        if "country" in query:
+            averaged = averaged[averaged["Country"] == query["country"]]
+        return 200, averaged.to_json(orient="records")
+    if parts == ["models"]:
+        if "formula" not in query:
+            return 400, json.dumps({"error": "Missing formula"})
+        if query.get("data", "pivoted") not in MODEL_DATA:
+            return 400, json.dumps({"error": f"Unknown data: {query['data']}"})
+        data_frame = datasets[query.get("data", "pivoted")]
+        try:
+            res = fit_model(data_frame, query["formula"])
+        except Exception as error:  # pylint: disable=broad-except
+            return 400, json.dumps({"error": str(error)})
+        return 200, json.dumps({"params": res.params.to_dict(),
+                                "bse": res.bse.to_dict(),
+                                "pvalues": res.pvalues.to_dict(),
+                                "rsquared": res.rsquared,
+                                "rsquared_adj": res.rsquared_adj,
+                                "aic": res.aic,
+                                "bic": res.bic,
+                                "nobs": res.nobs})
+    return 404, json.dumps({"error": f"Unknown endpoint: {url.path}"})
+
+
+def make_handler(input_path, cache_size=256):
+    """
+    Create the connection handler for the service, which keeps the datasets
+    and a least recently used cache of responses in memory.
+
+    Responses are cached under the version of the data, so when the data file
+    changes the datasets are reloaded and old responses are no longer used.
+    Reloading and answering uncached requests run in a thread, so slow ones
+    (such as fitting models) do not hold up other connections.
+
+    Args:
+        input_path: a string representing the filepath of the CSV of the
+            merged dataset
+        cache_size: the most responses to keep cached (default: 256)
+    Returns:
+        An async function to pass to asyncio.start_server.
+    """
+    state = {"datasets": load_datasets(input_path), "cache": new_cache()}
+
+    async def handle_connection(reader, writer):
+        # Read the request line and ignore the headers
+        request_line = (await reader.readline()).decode("latin-1").split()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        if len(request_line) < 2 or request_line[0] != "GET":
+            status, body = 405, json.dumps({"error": "Only GET is supported"})
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                # Reload the data and drop old responses if the file changed
+                datasets = await loop.run_in_executor(None, refresh_datasets,
+                                                      state["datasets"])
+                if datasets is not state["datasets"]:
+                    state["datasets"] = datasets
+                    state["cache"] = new_cache()
+                key = (datasets["version"], request_line[1])
+                response = cache_get(state["cache"], key)
+                if response is None:
+                    response = await loop.run_in_executor(None, handle_request,
+                                                           datasets, request_line[1])
+                    cache_put(state["cache"], key, response, cache_size)
+                status, body = response
+            except Exception as error:  # pylint: disable=broad-except
+                status, body = 500, json.dumps({"error": str(error)})
+
+        body = body.encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     "Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        writer.close()
+
+    return handle_connection
+
+
+async def serve(input_path, host="127.0.0.1", port=8000, cache_size=256):
+    """
+    Run the service until it is stopped.
+
+    Args:
+        input_path: a string representing the filepath of the CSV of the
+            merged dataset
+        host: a string representing the address to listen on (default:
+            "127.0.0.1", meaning only this computer)
+        port: an int representing the port to listen on (default: 8000)
+        cache_size: the most responses to keep cached (default: 256)
+    """
+    server = await asyncio.start_server(make_handler(input_path, cache_size), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--data", default="data/medals_gdp_pop_athletes.csv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=256)
+    args = parser.parse_args()
+    asyncio.run(serve(args.data, args.host, args.port, args.cache_size))
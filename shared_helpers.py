@@ -0,0 +1,161 @@
+"""
+Functions for sharing olympics data between processes without copying it.
+"""
+
+import json  # library for saving the index of a dataset
+import re  # regex library for splitting column names into metric and year
+from multiprocessing import resource_tracker, shared_memory  # library for memory shared by processes
+import numpy as np  # library for array math
+import pandas as pd  # library for data analysis
+
+from helpers import get_years
+
+
+def to_block(data_frame):
+    """
+    Convert a wide olympic dataframe into one numeric block and a small index.
+
+    Args:
+        data_frame: wide pandas dataframe containing olympic data (with columns
+            such as "Total-2004")
+    Returns:
+        A tuple of a float numpy array with shape (metrics, years, countries)
+        and a dictionary index with the "metrics", "years" and "countries" of
+        each axis. Metrics missing for a year are filled with NaN.
+    """
+    years = get_years(data_frame)
+    # Find every metric in the order that it first appears
+    metrics = []
+    for column in data_frame.columns:
+        match = re.fullmatch(r"(.+)-\d{4}", str(column))
+        if match is not None and match.group(1) not in metrics:
+            metrics.append(match.group(1))
+
+    block = np.full((len(metrics), len(years), len(data_frame)), np.nan)
+    for i, metric in enumerate(metrics):
+        for j, year in enumerate(years):
+            column = f"{metric}-{year}"
+            if column in data_frame.columns:
+                block[i, j] = pd.to_numeric(data_frame[column]).to_numpy(dtype=float)
+
+    index = {"metrics": metrics, "years": years,
+             "countries": data_frame["Country"].tolist()}
+    return block, index
+
+
+def to_frame(block, index):
+    """
+    Convert a numeric block and its index back into a wide olympic dataframe.
+
+    Args:
+        block: numpy array with shape (metrics, years, countries)
+        index: dictionary index returned by to_block
+    Returns:
+        A wide pandas dataframe with a "Country" column and a column for each
+        metric and year (e.g. "Total-2004").
+    """
+    columns = {"Country": index["countries"]}
+    for i, metric in enumerate(index["metrics"]):
+        for j, year in enumerate(index["years"]):
+            columns[f"{metric}-{year}"] = block[i, j]
+    return pd.DataFrame(columns)
+
+
+def publish_dataset(data_frame, name=None):
+    """
+    Copy the numeric block of a wide olympic dataframe into shared memory once
+    so other processes can attach to it without copying or pickling it.
+
+    The shared memory stays allocated until the publishing process calls
+    close() and unlink() on the returned SharedMemory.
+
+    Args:
+        data_frame: wide pandas dataframe containing olympic data
+        name: a string naming the shared memory block (optional, a unique name
+            is chosen if not given)
+    Returns:
+        A tuple of the SharedMemory object and the dictionary index that
+        workers pass to attach_dataset. The index also holds the "name",
+        "shape" and "dtype" of the shared block.
+    """
+    block, index = to_block(data_frame)
+    memory = shared_memory.SharedMemory(name=name, create=True, size=max(block.nbytes, 1))
+    # Copy the block into the shared memory
+    shared_block = np.ndarray(block.shape, dtype=block.dtype, buffer=memory.buf)
+    shared_block[:] = block
+    index.update({"name": memory.name, "shape": list(block.shape),
+                  "dtype": block.dtype.str})
+    return memory, index
+
+
+def attach_dataset(index):
+    """
+    Attach to a dataset published by publish_dataset without copying it.
+
+    The returned SharedMemory must be kept for as long as the block is used,
+    and closed (but not unlinked) when the worker is done with it.
+
+    Args:
+        index: dictionary index returned by publish_dataset
+    Returns:
+        A tuple of the SharedMemory object and a read-only numpy array with
+        shape (metrics, years, countries) backed by the shared memory.
+    """
+    try:
+        # Python 3.13+ can stop this process from unlinking the block on exit
+        memory = shared_memory.SharedMemory(name=index["name"], track=False)
+    except TypeError:
+        # Older versions register the block with the resource tracker, which
+        # unlinks it for every process when this one exits. Forked workers
+        # share the publisher's tracker, so the block must not be registered
+        # (rather than unregistered afterwards, which would also drop the
+        # publisher's registration)
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: (
+            None if rtype == "shared_memory" else register(name, rtype))
+        try:
+            memory = shared_memory.SharedMemory(name=index["name"])
+        finally:
+            resource_tracker.register = register
+    block = np.ndarray(tuple(index["shape"]), dtype=np.dtype(index["dtype"]),
+                       buffer=memory.buf)
+    block.flags.writeable = False
+    return memory, block
+
+
+def save_memmap(data_frame, path):
+    """
+    Save the numeric block of a wide olympic dataframe as a NumPy file that
+    processes can memory-map, along with its index as JSON.
+
+    Args:
+        data_frame: wide pandas dataframe containing olympic data
+        path: a string representing the filepath of the NumPy file, ending in
+            ".npy" (the index is saved next to it with ".json" added)
+    Returns:
+        The dictionary index of the saved block.
+    """
+    block, index = to_block(data_frame)
+    np.save(path, block)
+    with open(f"{path}.json", "w", encoding="utf-8") as index_file:
+        json.dump(index, index_file)
+    return index
+
+
+def load_memmap(path):
+    """
+    Memory-map a NumPy file saved by save_memmap without reading it into memory.
+
+    Pages of the file are shared by the operating system between every
+    process that maps it, so memory does not grow with the number of workers.
+
+    Args:
+        path: a string representing the filepath of the NumPy file
+    Returns:
+        A tuple of a read-only memory-mapped numpy array with shape (metrics,
+        years, countries) and its dictionary index.
+    """
+    block = np.load(path, mmap_mode="r")
+    with open(f"{path}.json", encoding="utf-8") as index_file:
+        index = json.load(index_file)
+    return block, index
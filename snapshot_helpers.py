@@ -0,0 +1,212 @@
+"""
+Functions for keeping every version of the scraped tables, along with the
+Wikipedia revisions they were scraped from.
+
+Tables are saved under their content hash, so a table that has not changed is
+only stored once no matter how many versions use it. A manifest lists every
+version of the dataset and which table and page revisions it is made of.
+"""
+
+import datetime  # library for timestamping versions
+import hashlib  # library for hashing tables
+import json  # library for reading and writing the manifest
+import os  # library for working with file paths
+from urllib.parse import unquote, urlsplit  # library for parsing urls
+import pandas as pd  # library for data analysis
+import requests  # library to handle requests
+
+from helpers import (
+    EDITIONS,
+    GDP_PAGE,
+    POPULATION_PAGE,
+    scrape_gdp_data,
+    scrape_medal_data,
+    scrape_population_data
+)
+
+# Raw tables to keep snapshots of. Each name maps to the function that scrapes
+# it and the Wikipedia pages that it is scraped from.
+SOURCES = {
+    "medals_raw": {"scrape": scrape_medal_data,
+                   "urls": [edition["medal_page"] for edition in EDITIONS.values()]},
+    "gdp_raw": {"scrape": scrape_gdp_data, "urls": [GDP_PAGE]},
+    "population_raw": {"scrape": scrape_population_data, "urls": [POPULATION_PAGE]},
+}
+
+
+def page_revision(url):
+    """
+    Find the ID of the current revision of a Wikipedia article.
+
+    Args:
+        url: string representing the url of a wikipedia article.
+    Returns:
+        An int representing the revision ID, or None if it could not be found.
+    """
+    parts = urlsplit(url)
+    # The mobile site shares its articles with the desktop site
+    host = parts.netloc.replace(".m.wikipedia.org", ".wikipedia.org")
+    title = unquote(parts.path.split("/wiki/", 1)[1])
+    response = requests.get(f"https://{host}/w/api.php",
+                            params={"action": "query", "prop": "revisions",
+                                    "titles": title, "rvprop": "ids",
+                                    "format": "json", "redirects": 1})
+    # Status code must be 200 to use the response
+    if response.status_code == 200:
+        for page in response.json()["query"]["pages"].values():
+            if "revisions" in page:
+                return page["revisions"][0]["revid"]
+    print("Error: Could not find the revision of this page.")
+    return None
+
+
+def table_hash(data_frame):
+    """
+    Compute the content hash of a table.
+
+    Args:
+        data_frame: pandas dataframe to hash
+    Returns:
+        A string of the hexadecimal SHA-256 hash of the table as a CSV.
+    """
+    return hashlib.sha256(data_frame.to_csv(index=False).encode("utf-8")).hexdigest()
+
+
+def load_manifest(store_path):
+    """
+    Load the list of versions saved in a snapshot store.
+
+    Args:
+        store_path: a string representing the directory of the store
+    Returns:
+        A list of dictionaries, one for each version, from oldest to newest.
+    """
+    manifest_path = os.path.join(store_path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def load_checked(store_path):
+    """
+    Load the tables and page revisions that were last checked in a snapshot
+    store, including revisions that did not change a table's contents.
+
+    Args:
+        store_path: a string representing the directory of the store
+    Returns:
+        A dictionary mapping the name of each table to its "hash" and
+        "revisions", or an empty dictionary if nothing was checked yet.
+    """
+    checked_path = os.path.join(store_path, "checked.json")
+    if not os.path.exists(checked_path):
+        return {}
+    with open(checked_path, encoding="utf-8") as checked_file:
+        return json.load(checked_file)
+
+
+def store_table(store_path, data_frame):
+    """
+    Save a table in a snapshot store under its content hash, unless a table
+    with the same contents is already saved.
+
+    Args:
+        store_path: a string representing the directory of the store
+        data_frame: pandas dataframe to save
+    Returns:
+        The content hash of the table.
+    """
+    digest = table_hash(data_frame)
+    object_path = os.path.join(store_path, "objects", f"{digest}.csv")
+    if not os.path.exists(object_path):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        data_frame.to_csv(object_path, index=False)
+    return digest
+
+
+def refresh_snapshots(store_path, sources=None):
+    """
+    Scrape the tables whose Wikipedia pages have new revisions and save a new
+    version of the dataset if any of them changed.
+
+    A table is only scraped again when the revision of one of its pages has
+    changed since the latest version, and only saved again when its contents
+    have changed. If nothing changed, no version is added and None is
+    returned, so later cleaning and merging can be skipped. The revisions of
+    every check are saved in "checked.json", so a new revision that does not
+    change a table is only scraped once.
+
+    Args:
+        store_path: a string representing the directory of the store
+        sources: a dictionary with the same layout as SOURCES (default:
+            SOURCES)
+    Returns:
+        The dictionary describing the new version, or None if nothing changed.
+    """
+    if sources is None:
+        sources = SOURCES
+    manifest = load_manifest(store_path)
+    latest = manifest[-1]["tables"] if manifest else {}
+    # Revisions that were checked after the latest version, whose tables had
+    # not changed
+    checked = {**latest, **load_checked(store_path)}
+
+    tables = dict(checked)
+    changed = False
+    scraped = False
+    for name, source in sources.items():
+        revisions = {url: page_revision(url) for url in source["urls"]}
+        previous = checked.get(name)
+        # Skip scraping tables whose pages have not changed
+        if (previous is not None and previous["revisions"] == revisions
+                and None not in revisions.values()):
+            continue
+        digest = store_table(store_path, source["scrape"]())
+        tables[name] = {"hash": digest, "revisions": revisions}
+        scraped = True
+        if name not in latest or latest[name]["hash"] != digest:
+            changed = True
+
+    # Remember the revisions that were checked, so unchanged tables are not
+    # scraped again until their pages change
+    if scraped:
+        os.makedirs(store_path, exist_ok=True)
+        checked_path = os.path.join(store_path, "checked.json")
+        with open(checked_path, "w", encoding="utf-8") as checked_file:
+            json.dump(tables, checked_file, indent=2)
+
+    if not changed:
+        return None
+    version = {"version": len(manifest) + 1,
+               "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+               "tables": tables}
+    manifest.append(version)
+    os.makedirs(store_path, exist_ok=True)
+    with open(os.path.join(store_path, "manifest.json"), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return version
+
+
+def load_snapshot(store_path, version=None, output_path=None):
+    """
+    Load the tables of any saved version of the dataset.
+
+    Args:
+        store_path: a string representing the directory of the store
+        version: an int representing the version to load (default: the latest)
+        output_path: a string representing a directory to save each table to
+            as "<name>.csv", so it can be cleaned like the files in data/
+            (optional)
+    Returns:
+        A dictionary mapping the name of each table to its dataframe.
+    """
+    manifest = load_manifest(store_path)
+    entry = manifest[-1] if version is None else manifest[version - 1]
+    tables = {}
+    for name, table in entry["tables"].items():
+        tables[name] = pd.read_csv(os.path.join(store_path, "objects", f"{table['hash']}.csv"))
+        # If a location to save the csvs is given, save them there
+        if output_path is not None:
+            tables[name].to_csv(os.path.join(output_path, f"{name}.csv"), index=False)
+    return tables
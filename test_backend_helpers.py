@@ -0,0 +1,105 @@
+"""
+Cases and functions for testing that the Polars and DuckDB backends in
+backend_helpers.py give the same results as the pandas functions in helpers.py
+"""
+import pytest
+import pandas as pd
+
+from helpers import (
+    average_data,
+    clean_gdp_data,
+    clean_population_data,
+    derive_metrics,
+    merge_dataframes,
+    pivot
+)
+
+backend_cases = ["polars", "duckdb"]
+
+
+@pytest.mark.parametrize("backend", backend_cases)
+def test_clean_data_backends(backend):
+    """
+    Test the clean_gdp_data() and clean_population_data() functions in
+    helpers.py with each backend.
+
+    Args:
+        backend: a string representing the backend to test.
+    """
+    pytest.importorskip(backend)
+    for number in [1, 2]:
+        df_gdp = pd.read_csv(f"test_data/gdp_test_data{number}_clean.csv")
+        pd.testing.assert_frame_equal(df_gdp, clean_gdp_data(
+            f"test_data/gdp_test_data{number}_raw.csv", backend=backend))
+        df_pop = pd.read_csv(f"test_data/pop_test_data{number}_clean.csv")
+        pd.testing.assert_frame_equal(df_pop, clean_population_data(
+            f"test_data/pop_test_data{number}_raw.csv", backend=backend))
+
+
+@pytest.mark.parametrize("backend", backend_cases)
+def test_merge_dataframes_backends(backend):
+    """
+    Test the merge_dataframes() function in helpers.py with each backend.
+
+    Args:
+        backend: a string representing the backend to test.
+    """
+    pytest.importorskip(backend)
+    df_merged = pd.read_csv("test_data/merge_test_data.csv")
+    test_medals = pd.read_csv("test_data/medals_test_data_clean.csv")
+    test_gdp = pd.read_csv("test_data/gdp_test_data1_clean.csv")
+    test_pop = pd.read_csv("test_data/pop_test_data1_clean.csv")
+    pd.testing.assert_frame_equal(df_merged, merge_dataframes(
+        [test_medals, test_gdp, test_pop], backend=backend))
+
+
+@pytest.mark.parametrize("backend", backend_cases)
+@pytest.mark.parametrize("method", ["left", "inner", "outer", "right"])
+def test_merge_dataframes_backends_missing(backend, method):
+    """
+    Test that merge_dataframes() in helpers.py gives the same rows, columns,
+    and dtypes with each backend as with pandas when some rows are missing
+    from some of the dataframes.
+
+    Args:
+        backend: a string representing the backend to test.
+        method: the kind of merge to test.
+    """
+    pytest.importorskip(backend)
+    test_medals = pd.read_csv("test_data/medals_test_data_clean.csv")
+    test_gdp = pd.read_csv("test_data/gdp_test_data1_clean.csv")
+    test_pop = pd.read_csv("test_data/pop_test_data1_clean.csv")
+    test_athletes = pd.read_csv("test_data/averaging_test_data.csv")
+    test_athletes = test_athletes[["Country"] + [f"Athletes-{year}" for year in
+                                                 ["2004", "2008", "2012", "2016"]]]
+    df_list = [test_medals.iloc[3:], test_gdp.iloc[::-1], test_pop, test_athletes.iloc[:5]]
+    df_merged = merge_dataframes(df_list, method=method)
+    merged = merge_dataframes(df_list, method=method, backend=backend)
+    pd.testing.assert_frame_equal(df_merged, merged)
+    # The missing values can be used in calculations
+    pd.testing.assert_frame_equal(derive_metrics(df_merged), derive_metrics(merged))
+
+
+@pytest.mark.parametrize("backend", backend_cases)
+def test_pivot_and_average_backends(backend):
+    """
+    Test the pivot() and average_data() functions in helpers.py with each
+    backend.
+
+    Args:
+        backend: a string representing the backend to test.
+    """
+    pytest.importorskip(backend)
+    df_pivot = pd.read_csv("test_data/pivoting_test_data.csv")
+    pd.testing.assert_frame_equal(pivot(df_pivot), pivot(df_pivot, backend=backend))
+    df_done = pd.read_csv("test_data/averaging_test_data_done.csv")
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    pd.testing.assert_frame_equal(df_done, average_data(df_raw, backend=backend))
+
+
+def test_unknown_backend():
+    """
+    Test that an unknown backend is reported.
+    """
+    with pytest.raises(ValueError):
+        average_data(pd.read_csv("test_data/averaging_test_data.csv"), backend="spark")
@@ -0,0 +1,52 @@
+"""
+Cases and functions for testing the functions in the db_helpers.py file
+"""
+import pandas as pd
+
+from db_helpers import build_store, load_frame, query_wide
+from helpers import average_data
+
+
+def test_query_wide():
+    """
+    Test that the query_wide() function in db_helpers.py returns the dataset
+    that was loaded, and that average_data() gives the same averages from it.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    connection = build_store(":memory:", [df_raw])
+    df_wide = query_wide(connection)
+    pd.testing.assert_frame_equal(df_raw, df_wide)
+    df_done = pd.read_csv("test_data/averaging_test_data_done.csv")
+    assert df_done.equals(average_data(df_wide))
+
+
+def test_query_wide_subset():
+    """
+    Test loading a subset of countries, years, and tables with the
+    query_wide() function in db_helpers.py.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    connection = build_store(":memory:", [df_raw])
+    countries = list(df_raw["Country"].iloc[[5, 2]])
+    df_subset = query_wide(connection, countries=countries, years=[2008, 2016],
+                           tables=["medals", "gdp"])
+    columns = ["Country"] + [f"{metric}-{year}" for year in [2008, 2016]
+                             for metric in ["Gold", "Silver", "Bronze", "Total"]]
+    columns += ["GDP-2008", "GDP-2016"]
+    # Countries come back in the order they were loaded
+    df_expected = df_raw.iloc[[2, 5]][columns].reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_expected, df_subset)
+
+
+def test_load_frame_tables():
+    """
+    Test that loading the cleaned tables one after another with the
+    load_frame() function in db_helpers.py gives the same dataset as
+    merge_dataframes().
+    """
+    df_merged = pd.read_csv("test_data/merge_test_data.csv")
+    connection = build_store(":memory:", [pd.read_csv("test_data/medals_test_data_clean.csv")])
+    load_frame(connection, pd.read_csv("test_data/gdp_test_data1_clean.csv"))
+    load_frame(connection, pd.read_csv("test_data/pop_test_data1_clean.csv"))
+    df_wide = query_wide(connection, tables=["medals", "gdp", "population"])
+    pd.testing.assert_frame_equal(df_merged[df_wide.columns], df_wide, check_dtype=False)
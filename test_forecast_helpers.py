@@ -0,0 +1,35 @@
+"""
+Cases and functions for testing the functions in the forecast_helpers.py file
+"""
+# numpy is used by the formulas, which are evaluated in this file
+import numpy as np  # pylint: disable=unused-import
+import pandas as pd
+import statsmodels.formula.api as smf
+
+from forecast_helpers import forecast_medals
+from helpers import pivot
+
+MEDALS = ["Gold", "Silver", "Bronze", "Total"]
+
+
+def test_forecast_medals():
+    """
+    Test the forecast_medals() function in forecast_helpers.py.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    for column in MEDALS + ["GDP", "Pop", "Athletes"]:
+        df_pivot[column] = pd.to_numeric(df_pivot[column])
+    fits = [smf.ols(f"{medal} ~ np.log(GDP) + np.log(Pop) + Athletes", data=df_pivot).fit()
+            for medal in MEDALS]
+
+    forecasts = forecast_medals(df_pivot, fits, num_samples=2000, batch_size=10)
+    # Every country gets a forecast for the next games
+    assert sorted(forecasts["Country"]) == sorted(df_pivot["Country"].unique())
+    assert (forecasts["Year"] == "2020").all()
+    for medal in MEDALS:
+        assert (forecasts[f"{medal} Lower"] <= forecasts[medal]).all()
+        assert (forecasts[medal] <= forecasts[f"{medal} Upper"]).all()
+        assert (forecasts[f"{medal} Lower"] >= 0).all()
+    # Forecasts do not depend on the number of processes
+    pd.testing.assert_frame_equal(forecasts, forecast_medals(
+        df_pivot, fits, num_samples=2000, batch_size=10, max_workers=2))
@@ -3,14 +3,21 @@ Cases and functions for testing the non- scraping and plotting functions in the
 helpers.py file
 """
 import pytest
+import numpy as np
 import pandas as pd
 
 from helpers import (
+    append_edition,
     average_data,
+    averages_from_aggregates,
+    clean_data,
     clean_gdp_data,
     clean_population_data,
+    derive_metrics,
     merge_dataframes,
-    pivot
+    pivot,
+    rank_medals,
+    run_jobs
 )
 
 clean_gdp_data_cases = [
@@ -94,3 +101,124 @@ def test_average_data():
     df_raw = pd.read_csv("test_data/averaging_test_data.csv")
     # Assert the averaging done properly
     assert df_done.equals(average_data(df_raw))
+
+
+def test_derive_metrics():
+    """
+    Test the derive_metrics() function in helpers.py on both wide and pivoted
+    dataframes.
+    """
+    df_wide = pd.read_csv("test_data/averaging_test_data.csv")
+    df_pivot = pd.read_csv("test_data/pivoting_test_data_clean.csv")
+    metrics = {"Gold Share": "Gold / Total", "Per Athlete": "Total / Athletes"}
+    # Wide dataframes get a column for every metric and year
+    df_derived = derive_metrics(df_wide, metrics)
+    for year in ["2004", "2008", "2012", "2016"]:
+        pd.testing.assert_series_equal(
+            df_derived[f"Gold Share-{year}"],
+            df_wide[f"Gold-{year}"] / df_wide[f"Total-{year}"],
+            check_names=False)
+    # Number literals with exponents and functions are not metrics
+    df_derived = derive_metrics(df_wide, {"Per Million": "Total / Pop * 1e6",
+                                          "Log GDP": "log(GDP)"})
+    pd.testing.assert_series_equal(df_derived["Per Million-2004"],
+                                   df_wide["Total-2004"] / df_wide["Pop-2004"] * 1e6,
+                                   check_names=False)
+    pd.testing.assert_series_equal(df_derived["Log GDP-2004"],
+                                   np.log(df_wide["GDP-2004"]), check_names=False)
+    # Population is in thousands in the merged dataset
+    df_merged = pd.read_csv("data/medals_gdp_pop_athletes.csv").set_index("Country")
+    df_derived = derive_metrics(df_merged, ["Medals per Million"])
+    assert df_derived.loc["United States", "Medals per Million-2004"] == pytest.approx(
+        101 / 295.517)
+    # Pivoted dataframes get a column for every metric
+    df_derived = derive_metrics(df_pivot, ["Success Rate"])
+    pd.testing.assert_series_equal(df_derived["Success Rate"],
+                                   df_pivot["Success Rate"])
+
+
+def test_rank_medals():
+    """
+    Test the rank_medals() function in helpers.py, including ties.
+    """
+    # Load the correctly ranked dataframe to check against
+    df_done = pd.read_csv("test_data/ranking_test_data_done.csv")
+    # Load test dataframe to be ranked
+    df_raw = pd.read_csv("test_data/ranking_test_data.csv")
+    # Assert the official gold-first ranking done properly
+    pd.testing.assert_frame_equal(df_done, rank_medals(df_raw, ["gold"]))
+    # Assert the other methods share and skip ranks properly
+    df_ranked = rank_medals(df_raw, ["total", "weighted"], ties="dense")
+    assert df_ranked["Total Rank-2004"].tolist() == [2, 1, 1, 3]
+    assert df_ranked["Weighted Rank-2008"].tolist() == [1, 1, 2, 1]
+    # Years without medal columns are not ranked by any method
+    df_ranked = rank_medals(df_raw.assign(**{"GDP-2012": [1.0, 2.0, 3.0, 4.0]}))
+    assert "Weighted Rank-2012" not in df_ranked.columns
+    assert df_ranked["Weighted Rank-2008"].tolist() == [1, 1, 4, 1]
+
+
+def test_run_jobs():
+    """
+    Test the run_jobs() function in helpers.py by cleaning the GDP and
+    population test data in a process pool.
+    """
+    jobs = {"gdp": (clean_gdp_data, (clean_gdp_data_cases[0][0],)),
+            "pop": (clean_population_data, (clean_pop_data_cases[0][0],))}
+    results = run_jobs(jobs, max_workers=2)
+    # Assert the results come back under the right names and cleaned properly
+    assert list(results) == ["gdp", "pop"]
+    assert pd.read_csv(clean_gdp_data_cases[0][1]).equals(results["gdp"])
+    assert pd.read_csv(clean_pop_data_cases[0][1]).equals(results["pop"])
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_clean_data(tmp_path, max_workers):
+    """
+    Test the clean_data() function in helpers.py.
+
+    Args:
+        tmp_path: directory to save the cleaned CSVs in.
+        max_workers: number of processes to clean the datasets in.
+    """
+    gdp_path = str(tmp_path / "gdp.csv")
+    pop_path = str(tmp_path / "pop.csv")
+    gdp, population = clean_data(clean_gdp_data_cases[0][0], clean_pop_data_cases[0][0],
+                                 gdp_path, pop_path, max_workers=max_workers)
+    # Assert each dataset is cleaned properly and saved by its process
+    assert pd.read_csv(clean_gdp_data_cases[0][1]).equals(gdp)
+    assert pd.read_csv(clean_pop_data_cases[0][1]).equals(population)
+    assert pd.read_csv(gdp_path).equals(gdp)
+    assert pd.read_csv(pop_path).equals(population)
+
+
+def test_append_edition():
+    """
+    Test that adding the last year with the append_edition() function in
+    helpers.py gives the same data and averages as processing every year.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    df_done = pd.read_csv("test_data/averaging_test_data_done.csv")
+    # Split the test data into the earlier years and the tables of 2016
+    old_years = df_raw.filter(regex="^Country$|-20(04|08|12)$")
+    medals_2016 = df_raw.filter(regex="^Country$|^(Gold|Silver|Bronze|Total)-2016$")
+    other_2016 = df_raw.filter(regex="^Country$|^(Pop|GDP|Athletes)-2016$")
+    merged, aggregates = append_edition(old_years, [medals_2016, other_2016])
+    # Assert the merged data and averages match processing every year at once
+    pd.testing.assert_frame_equal(merged[df_raw.columns], df_raw)
+    pd.testing.assert_frame_equal(averages_from_aggregates(aggregates), df_done)
+
+
+def test_append_edition_scraped_strings():
+    """
+    Test that append_edition() in helpers.py accepts tables whose numbers are
+    strings, as scrape_athlete_table returns them.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    df_done = pd.read_csv("test_data/averaging_test_data_done.csv")
+    old_years = df_raw.filter(regex="^Country$|-20(04|08|12)$")
+    medals_2016 = df_raw.filter(regex="^Country$|^(Gold|Silver|Bronze|Total)-2016$")
+    other_2016 = df_raw.filter(regex="^Country$|^(Pop|GDP)-2016$")
+    athletes_2016 = df_raw[["Country", "Athletes-2016"]].astype(str)
+    merged, aggregates = append_edition(old_years, [medals_2016, other_2016, athletes_2016])
+    pd.testing.assert_frame_equal(merged[df_raw.columns], df_raw)
+    pd.testing.assert_frame_equal(averages_from_aggregates(aggregates), df_done)
@@ -0,0 +1,102 @@
+"""
+Cases and functions for testing the functions in the match_helpers.py file
+"""
+import pytest
+import pandas as pd
+
+import match_helpers
+from bench_match import synthetic_names
+from helpers import merge_dataframes
+from match_helpers import edit_distance, match_keys
+
+edit_distance_cases = [
+    ("kitten", "sitting", None, 3),
+    ("", "abc", None, 3),
+    ("Gambia", "Gambia", None, 0),
+    ("azerbaijan", "serbia", 2, 3),
+]
+
+
+@pytest.mark.parametrize("first,second,max_distance,distance", edit_distance_cases)
+def test_edit_distance(first, second, max_distance, distance):
+    """
+    Test the edit_distance() function in match_helpers.py.
+
+    Args:
+        first: the first string.
+        second: the second string.
+        max_distance: the distance to stop computing at.
+        distance: the distance that should be returned.
+    """
+    assert edit_distance(first, second, max_distance) == distance
+
+
+def test_match_keys():
+    """
+    Test that match_keys() in match_helpers.py matches accents, ASCII-stripped
+    names, aliases, and misspellings, but not different countries.
+    """
+    keys = ["So Tom and Prncipe", "Ivory Coast", "The Gambia", "bAfghanistan",
+            "Azerbaijan", "Iceland"]
+    candidates = ["São Tomé and Príncipe", "Côte d'Ivoire", "Gambia", "Afghanistan",
+                  "Serbia", "Iceland"]
+    matches = match_keys(keys, candidates)
+    assert dict(zip(matches["Key"], matches["Match"])) == {
+        "So Tom and Prncipe": "São Tomé and Príncipe",
+        "Ivory Coast": "Côte d'Ivoire",
+        "The Gambia": "Gambia",
+        "bAfghanistan": "Afghanistan"}
+
+
+@pytest.mark.parametrize("num_names", [500, 4000])
+def test_match_keys_scaling(num_names, monkeypatch):
+    """
+    Test that match_keys() in match_helpers.py computes at most max_candidates
+    edit distances for each key however many candidates there are, and still
+    matches most misspelled names back to their original.
+
+    Args:
+        num_names: the number of names to match.
+        monkeypatch: pytest fixture for counting calls of edit_distance.
+    """
+    names, misspelled = synthetic_names(num_names)
+    calls = []
+
+    def counted_distance(*args):
+        calls.append(args)
+        return edit_distance(*args)
+
+    monkeypatch.setattr(match_helpers, "edit_distance", counted_distance)
+    matches = match_keys(misspelled, names, max_candidates=10)
+    assert len(calls) <= 10 * num_names
+    originals = dict(zip(misspelled, names))
+    assert (matches["Key"].map(originals) == matches["Match"]).sum() > 0.8 * num_names
+
+
+def test_merge_dataframes_reconcile():
+    """
+    Test that merge_dataframes() in helpers.py keeps rows spelled differently
+    in different dataframes when reconcile is True.
+    """
+    medals = pd.DataFrame({"Country": ["Côte d'Ivoire", "Iceland"], "Total-2016": [2, 1]})
+    athletes = pd.DataFrame({"Country": ["Ivory Coast", "Iceland"], "Athletes-2016": [12, 5]})
+    merged = merge_dataframes([medals, athletes], method="inner")
+    assert merged["Country"].tolist() == ["Iceland"]
+    merged = merge_dataframes([medals, athletes], method="inner", reconcile=True)
+    assert merged["Country"].tolist() == ["Côte d'Ivoire", "Iceland"]
+    assert merged["Athletes-2016"].tolist() == [12, 5]
+
+
+def test_merge_dataframes_reconcile_near_miss():
+    """
+    Test that merge_dataframes() in helpers.py does not rename keys that
+    already match exactly to similar keys (e.g. Iceland and Ireland) when
+    reconcile is True.
+    """
+    medals = pd.DataFrame({"Country": ["Ireland", "Iceland", "Australia"],
+                           "Total-2016": [2, 1, 29]})
+    athletes = pd.DataFrame({"Country": ["Iceland", "Austria"], "Athletes-2016": [5, 71]})
+    merged = merge_dataframes([medals, athletes], reconcile=True)
+    assert merged["Country"].tolist() == ["Ireland", "Iceland", "Australia"]
+    assert merged["Athletes-2016"].isna().tolist() == [True, False, True]
+    assert merged["Athletes-2016"].iloc[1] == 5
@@ -0,0 +1,150 @@
+"""
+Cases and functions for testing the functions in the model_helpers.py file
+"""
+import pytest
+import numpy as np
+import pandas as pd
+import statsmodels.formula.api as smf
+
+from helpers import pivot
+from model_helpers import (
+    correlation_matrices,
+    merge_ols_statistics,
+    ols_from_statistics,
+    ols_statistics,
+    panel_ols,
+    select_models,
+    streaming_ols
+)
+
+formulas = [
+    "Total ~ GDP + Pop + Athletes",
+    "Total ~ np.log(GDP) + np.log(Pop) + Athletes",
+    "Total ~ np.log(GDP) * Athletes",
+    "Gold ~ Athletes - 1",
+    "Total ~ C(Year) - 1",
+    "Total ~ np.log(GDP):C(Year)",
+]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_select_models(max_workers):
+    """
+    Test that select_models() in model_helpers.py matches statsmodels.
+
+    Args:
+        max_workers: number of processes to fit the formulas in.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    table = select_models(df_pivot, formulas, max_workers=max_workers)
+    assert sorted(table["Formula"]) == sorted(formulas)
+    assert table["AIC"].is_monotonic_increasing
+    for formula in formulas:
+        res = smf.ols(formula, data=df_pivot).fit()
+        row = table[table["Formula"] == formula].iloc[0]
+        assert row["Observations"] == res.nobs
+        assert row["AIC"] == pytest.approx(res.aic)
+        assert row["BIC"] == pytest.approx(res.bic)
+        assert row["R-squared"] == pytest.approx(res.rsquared)
+        assert row["CV Error"] > 0
+
+
+def test_select_models_by_year():
+    """
+    Test that select_models() in model_helpers.py compares formulas within each
+    year.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    table = select_models(df_pivot, formulas[:2], rank_by="BIC", by="Year")
+    assert sorted(set(table["Subset"])) == ["2004", "2008", "2012", "2016", "All"]
+    assert len(table) == 10
+
+
+@pytest.mark.parametrize("cluster", [None, "Country"])
+def test_panel_ols(cluster):
+    """
+    Test that panel_ols() in model_helpers.py matches statsmodels with dummy
+    columns for every country and year.
+
+    Args:
+        cluster: name of the column to cluster standard errors by.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    result = panel_ols(df_pivot, "Total ~ np.log(GDP) + Athletes", cluster=cluster)
+    dummy_formula = "Total ~ np.log(GDP) + Athletes + C(Country) + C(Year)"
+    if cluster is None:
+        res = smf.ols(dummy_formula, data=df_pivot).fit()
+    else:
+        res = smf.ols(dummy_formula, data=df_pivot).fit(
+            cov_type="cluster", cov_kwds={"groups": pd.factorize(df_pivot["Country"])[0]})
+    for term in ["np.log(GDP)", "Athletes"]:
+        assert result["params"].loc[term, "Coefficient"] == pytest.approx(res.params[term])
+        assert result["params"].loc[term, "Std Error"] == pytest.approx(res.bse[term])
+    assert result["nobs"] == res.nobs
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_correlation_matrices(method):
+    """
+    Test that correlation_matrices() in model_helpers.py matches pandas.
+
+    Args:
+        method: the kind of correlation to check.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    df_pivot = pivot(df_raw)
+    metrics = ["Total", "GDP", "Pop", "Athletes"]
+    result = correlation_matrices(df_raw, metrics)
+    for year in ["2004", "2016"]:
+        expected = df_pivot[df_pivot["Year"] == year][metrics].corr(method=method)
+        np.testing.assert_allclose(result.loc[(method, year)], expected)
+    expected = df_pivot[metrics].corr(method=method)
+    np.testing.assert_allclose(result.loc[(method, "Pooled")], expected)
+    # Asking again returns the same cached result
+    pd.testing.assert_frame_equal(correlation_matrices(df_raw, metrics), result)
+
+
+def test_correlation_matrices_missing():
+    """
+    Test that correlation_matrices() in model_helpers.py only uses rows where
+    both metrics are present.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    df_raw.loc[:5, "GDP-2008"] = np.nan
+    df_raw.loc[3:9, "Pop-2008"] = np.nan
+    df_pivot = pivot(df_raw)
+    metrics = ["Total", "GDP", "Pop"]
+    result = correlation_matrices(df_raw, metrics)
+    expected = df_pivot[df_pivot["Year"] == "2008"][metrics].corr()
+    np.testing.assert_allclose(result.loc[("pearson", "2008")], expected)
+
+
+@pytest.mark.parametrize("formula", ["Total ~ np.log(GDP) + np.log(Pop) + Athletes",
+                                     "Total ~ Pop",
+                                     "Total ~ GDP + Pop + Athletes",
+                                     "Gold ~ Pop + Athletes - 1",
+                                     "Gold ~ Athletes - 1"])
+def test_streaming_ols(formula):
+    """
+    Test that streaming_ols() in model_helpers.py fit to chunks of data, and
+    to statistics merged from separate parts, matches statsmodels, including
+    with raw population (in persons) as a predictor.
+
+    Args:
+        formula: the formula to fit.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    res = smf.ols(formula, data=df_pivot).fit()
+    chunks = [df_pivot.iloc[i:i + 25] for i in range(0, len(df_pivot), 25)]
+    result = streaming_ols(chunks, formula)
+    np.testing.assert_allclose(result["params"]["Coefficient"], res.params)
+    np.testing.assert_allclose(result["params"]["Std Error"], res.bse)
+    np.testing.assert_allclose(result["params"]["P>|t|"], res.pvalues)
+    for name in ["rsquared", "rsquared_adj", "aic", "bic", "ssr", "nobs", "df_resid"]:
+        assert result[name] == pytest.approx(getattr(res, name))
+
+    # Statistics from separate workers can be merged
+    first = ols_statistics(df_pivot.iloc[:60], formula)
+    second = ols_statistics(df_pivot.iloc[60:], formula)
+    merged = ols_from_statistics(merge_ols_statistics(first, second))
+    np.testing.assert_allclose(merged["params"]["Coefficient"], res.params)
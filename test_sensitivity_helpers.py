@@ -0,0 +1,41 @@
+"""
+Cases and functions for testing the functions in the sensitivity_helpers.py
+file
+"""
+# numpy is used by the formulas, which are evaluated in this file
+import numpy as np  # pylint: disable=unused-import
+import pytest
+import pandas as pd
+import statsmodels.formula.api as smf
+
+from helpers import pivot
+from sensitivity_helpers import sensitivity_indices
+
+MEDALS = ["Gold", "Silver", "Bronze", "Total"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sensitivity_indices(max_workers):
+    """
+    Test the sensitivity_indices() function in sensitivity_helpers.py.
+
+    Args:
+        max_workers: number of processes to evaluate batches in.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    for column in MEDALS + ["GDP", "Pop", "Athletes"]:
+        df_pivot[column] = pd.to_numeric(df_pivot[column])
+    # Only athletes is used by the first model, so it explains all of the
+    # variance
+    fits = [smf.ols("Gold ~ Athletes", data=df_pivot).fit()]
+    fits += [smf.ols(f"{medal} ~ np.log(GDP) + np.log(Pop) + Athletes", data=df_pivot).fit()
+             for medal in MEDALS[1:]]
+
+    indices = sensitivity_indices(df_pivot, fits, num_samples=10000, batch_size=15000,
+                                  max_workers=max_workers)
+    assert set(indices["Subset"]) == {"Pooled", "2004", "2008", "2012", "2016"}
+    assert len(indices) == 5 * 2 * 3
+    gold = indices.set_index(["Subset", "Plan", "Input"])["Gold"]
+    assert gold.xs("Athletes", level="Input").to_numpy() == pytest.approx(1, abs=0.05)
+    assert gold.xs("GDP", level="Input").to_numpy() == pytest.approx(0, abs=0.01)
+    assert ((indices[MEDALS] > -0.1) & (indices[MEDALS] < 1.1)).all().all()
@@ -0,0 +1,97 @@
+"""
+Cases and functions for testing the service.py file
+"""
+import asyncio
+import json
+import os
+import shutil
+import pytest
+
+from service import handle_request, load_datasets, make_handler
+
+DATA_PATH = "test_data/averaging_test_data.csv"
+
+request_cases = [
+    ("/version", 200),
+    ("/countries/Great%20Britain", 200),
+    ("/countries/Atlantis", 404),
+    ("/years/2008", 200),
+    ("/averages?country=Laumar", 200),
+    ("/models?formula=Total~GDP%2BPop", 200),
+    ("/models?formula=Total~np.log(GDP)", 200),
+    ("/models?formula=Q('Average%20Total')~Q('Average%20GDP')&data=averaged", 200),
+    ("/models?formula=Total~Nothing", 400),
+    ("/models?formula=Total~GDP&data=version", 400),
+    ("/models?formula=Total~GDP&data=foo", 400),
+    ("/nothing", 404),
+]
+
+
+@pytest.mark.parametrize("target,status", request_cases)
+def test_handle_request(target, status):
+    """
+    Test the handle_request() function in service.py.
+
+    Args:
+        target: the path and query of the request.
+        status: the HTTP status code that should be returned.
+    """
+    datasets = load_datasets(DATA_PATH)
+    assert handle_request(datasets, target)[0] == status
+
+
+def test_handle_request_contents():
+    """
+    Test that handle_request() in service.py returns the right rows.
+    """
+    datasets = load_datasets(DATA_PATH)
+    rows = json.loads(handle_request(datasets, "/years/2008")[1])
+    assert len(rows) == len(datasets["merged"])
+    assert {row["Year"] for row in rows} == {"2008"}
+    rows = json.loads(handle_request(datasets, "/averages?country=Laumar")[1])
+    assert rows == [{"Country": "Laumar", "Average Total": 25.0,
+                     "Average GDP": 29871.25, "Average Pop": 628135527.25,
+                     "Average Athletes": 302.0}]
+
+
+async def fetch(handler, targets):
+    """
+    Start the service on a free port and send it GET requests.
+
+    Args:
+        handler: connection handler returned by make_handler.
+        targets: a list of paths and queries to request.
+    Returns:
+        A list of the raw responses.
+    """
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    responses = []
+    async with server:
+        for target in targets:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            responses.append(await reader.read())
+            writer.close()
+    return responses
+
+
+def test_service_reloads(tmp_path):
+    """
+    Test that the service in service.py answers over HTTP and stops using
+    cached responses when the data file changes.
+    """
+    path = str(tmp_path / "data.csv")
+    shutil.copy(DATA_PATH, path)
+    handler = make_handler(path)
+    first = asyncio.run(fetch(handler, ["/version", "/version"]))
+    assert first[0].startswith(b"HTTP/1.1 200")
+    assert first[0] == first[1]
+
+    # Change the data file so that the version changes
+    with open(path, "a", encoding="utf-8") as data_file:
+        data_file.write("\nNowhere" + ",1" * 28 + "\n")
+    os.utime(path, (0, 0))
+    second = asyncio.run(fetch(handler, ["/version"]))
+    assert second[0].startswith(b"HTTP/1.1 200")
+    assert second[0] != first[0]
@@ -0,0 +1,123 @@
+"""
+Cases and functions for testing the functions in the shared_helpers.py file
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+
+from shared_helpers import (
+    attach_dataset,
+    load_memmap,
+    publish_dataset,
+    save_memmap,
+    to_block,
+    to_frame
+)
+
+
+def total_medals(index):
+    """
+    Attach to a published dataset and sum its total medals, as a worker would.
+
+    Args:
+        index: dictionary index returned by publish_dataset.
+    Returns:
+        The sum of every total medal count in the dataset.
+    """
+    memory, block = attach_dataset(index)
+    total = float(np.nansum(block[index["metrics"].index("Total")]))
+    # Drop the view of the memory before closing it
+    del block
+    memory.close()
+    return total
+
+
+def test_to_block():
+    """
+    Test that to_block() and to_frame() in shared_helpers.py convert a wide
+    dataframe to a block and back without changing it.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    block, index = to_block(df_raw)
+    assert block.shape == (7, 4, len(df_raw))
+    assert index["years"] == ["2004", "2008", "2012", "2016"]
+    df_back = to_frame(block, index)
+    pd.testing.assert_frame_equal(df_raw.astype(df_back.dtypes.to_dict()),
+                                  df_back[df_raw.columns])
+
+
+def test_publish_dataset():
+    """
+    Test that workers in other processes can attach to a dataset published by
+    publish_dataset() in shared_helpers.py.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    memory, index = publish_dataset(df_raw)
+    try:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            totals = list(executor.map(total_medals, [index, index]))
+    finally:
+        memory.close()
+        memory.unlink()
+    expected = df_raw.filter(regex="^Total-").to_numpy().sum()
+    assert totals == [expected, expected]
+
+
+def test_publish_dataset_separate_processes():
+    """
+    Test that processes started separately can attach to a dataset published
+    by publish_dataset() in shared_helpers.py one after another, without the
+    first one removing it when it exits.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    memory, index = publish_dataset(df_raw)
+    script = ("import json, sys; from test_shared_helpers import total_medals; "
+              "print(total_medals(json.loads(sys.argv[1])))")
+    try:
+        totals = [float(subprocess.run([sys.executable, "-c", script, json.dumps(index)],
+                                       capture_output=True, text=True, check=True).stdout)
+                  for _ in range(2)]
+    finally:
+        memory.close()
+        memory.unlink()
+    expected = df_raw.filter(regex="^Total-").to_numpy().sum()
+    assert totals == [expected, expected]
+
+
+def test_publish_dataset_forked_workers():
+    """
+    Test that forked workers attaching to a dataset published by
+    publish_dataset() in shared_helpers.py leave it registered with the
+    publisher's resource tracker, so the tracker reports no errors when the
+    publisher unlinks it.
+    """
+    script = ("import pandas as pd; from concurrent.futures import ProcessPoolExecutor; "
+              "from shared_helpers import publish_dataset; "
+              "from test_shared_helpers import total_medals; "
+              "memory, index = publish_dataset("
+              "pd.read_csv('test_data/averaging_test_data.csv')); "
+              "executor = ProcessPoolExecutor(max_workers=2); "
+              "print(list(executor.map(total_medals, [index, index]))); "
+              "executor.shutdown(); memory.close(); memory.unlink()")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            check=True)
+    assert "Error" not in result.stderr
+    assert "leaked" not in result.stderr
+
+
+def test_save_memmap(tmp_path):
+    """
+    Test that a dataset saved by save_memmap() in shared_helpers.py loads back
+    as a read-only memory map.
+    """
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    path = str(tmp_path / "dataset.npy")
+    save_memmap(df_raw, path)
+    block, index = load_memmap(path)
+    assert isinstance(block, np.memmap)
+    assert not block.flags.writeable
+    np.testing.assert_array_equal(block, to_block(df_raw)[0])
+    assert index["countries"] == df_raw["Country"].tolist()
@@ -0,0 +1,57 @@
+"""
+Cases and functions for testing the functions in the snapshot_helpers.py file
+"""
+import os
+import pandas as pd
+
+import snapshot_helpers
+from snapshot_helpers import load_manifest, load_snapshot, refresh_snapshots
+
+
+def test_refresh_snapshots(tmp_path, monkeypatch):
+    """
+    Test that refresh_snapshots() in snapshot_helpers.py only scrapes and
+    saves tables when their pages and contents change, and that every version
+    can be loaded again.
+    """
+    revisions = {"https://en.wikipedia.org/wiki/GDP": 1,
+                 "https://en.wikipedia.org/wiki/Pop": 7}
+    monkeypatch.setattr(snapshot_helpers, "page_revision", revisions.get)
+    gdp = pd.read_csv("test_data/gdp_test_data1_raw.csv")
+    pop = pd.read_csv("test_data/pop_test_data1_raw.csv")
+    scraped = []
+
+    def scrape(name, data_frame):
+        def scraper():
+            scraped.append(name)
+            return data_frame
+        return scraper
+
+    sources = {"gdp_raw": {"scrape": scrape("gdp", gdp),
+                           "urls": ["https://en.wikipedia.org/wiki/GDP"]},
+               "population_raw": {"scrape": scrape("pop", pop),
+                                  "urls": ["https://en.wikipedia.org/wiki/Pop"]}}
+    store = str(tmp_path)
+    assert refresh_snapshots(store, sources)["version"] == 1
+    # Nothing is scraped or saved when no page has a new revision
+    assert refresh_snapshots(store, sources) is None
+    assert scraped == ["gdp", "pop"]
+
+    # A new revision with the same table is scraped but not saved
+    revisions["https://en.wikipedia.org/wiki/GDP"] = 2
+    assert refresh_snapshots(store, sources) is None
+    # and is not scraped again by later refreshes
+    assert refresh_snapshots(store, sources) is None
+    assert refresh_snapshots(store, sources) is None
+    assert scraped == ["gdp", "pop", "gdp"]
+    # A new revision with a changed table adds a version
+    revisions["https://en.wikipedia.org/wiki/GDP"] = 3
+    sources["gdp_raw"]["scrape"] = scrape("gdp", pd.read_csv("test_data/gdp_test_data2_raw.csv"))
+    assert refresh_snapshots(store, sources)["version"] == 2
+    assert scraped == ["gdp", "pop", "gdp", "gdp"]
+
+    # Unchanged tables are only stored once
+    assert len(os.listdir(tmp_path / "objects")) == 3
+    assert len(load_manifest(store)) == 2
+    assert load_snapshot(store, 1)["gdp_raw"].equals(gdp)
+    assert load_snapshot(store)["population_raw"].equals(pop)
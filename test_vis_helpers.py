@@ -0,0 +1,96 @@
+"""
+Cases and functions for testing the figure caching in the vis_helpers.py file
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import vis_helpers
+from helpers import pivot
+from vis_helpers import medals_figure, memoize_figure
+
+
+def test_medals_figure():
+    """
+    Test that medals_figure() in vis_helpers.py reuses the figure it built for
+    unchanged data and rebuilds it when the data changes.
+    """
+    df_pivot = pivot(pd.read_csv("test_data/averaging_test_data.csv"))
+    vis_helpers.FIGURE_CACHE.clear()
+    first = medals_figure(df_pivot, "GDP", "Total")
+    second = medals_figure(df_pivot, "GDP", "Total")
+    assert len(vis_helpers.FIGURE_CACHE) == 1
+    assert first.to_json() == second.to_json()
+    # Changing the figure that was returned does not change the cached one
+    second.update_layout(title="Changed")
+    assert medals_figure(df_pivot, "GDP", "Total").layout.title.text != "Changed"
+
+    df_pivot.loc[0, "Total"] = 1000
+    third = medals_figure(df_pivot, "GDP", "Total")
+    assert len(vis_helpers.FIGURE_CACHE) == 2
+    assert third.to_json() != first.to_json()
+
+
+def test_memoize_figure_disk(tmp_path, monkeypatch):
+    """
+    Test that memoize_figure() in vis_helpers.py saves figures to disk and
+    loads them again after the memory cache is cleared.
+    """
+    monkeypatch.setattr(vis_helpers, "FIGURE_CACHE_DIR", str(tmp_path))
+    calls = []
+
+    @memoize_figure
+    def scatter(data_frame, column):
+        calls.append(column)
+        return px.scatter(data_frame, x="Country", y=column)
+
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    first = scatter(df_raw, "Total-2004")
+    vis_helpers.FIGURE_CACHE.clear()
+    second = scatter(df_raw, "Total-2004")
+    assert calls == ["Total-2004"]
+    assert len(list(tmp_path.iterdir())) == 1
+    assert first.to_json() == second.to_json()
+
+
+def test_memoize_figure_arguments():
+    """
+    Test that memoize_figure() in vis_helpers.py tells apart large dataframe
+    and array arguments whose reprs are the same.
+    """
+    @memoize_figure
+    def highlight(data_frame, other, values):
+        return px.scatter(x=other["Total-2004"], y=values[:len(other)])
+
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+    values = np.arange(2000.0)
+    changed_frame = df_raw.copy()
+    changed_frame.loc[30, "Total-2004"] = 1000
+    changed_values = values.copy()
+    changed_values[1000] = -1
+    assert repr(changed_frame) == repr(df_raw) and repr(changed_values) == repr(values)
+    vis_helpers.FIGURE_CACHE.clear()
+    first = highlight(df_raw, df_raw, values)
+    assert highlight(df_raw, changed_frame, values).to_json() != first.to_json()
+    highlight(df_raw, df_raw, changed_values)
+    assert len(vis_helpers.FIGURE_CACHE) == 3
+
+
+def test_memoize_figure_disk_version(tmp_path, monkeypatch):
+    """
+    Test that memoize_figure() in vis_helpers.py does not reuse figures saved
+    to disk by a builder whose code has changed since.
+    """
+    monkeypatch.setattr(vis_helpers, "FIGURE_CACHE_DIR", str(tmp_path))
+    df_raw = pd.read_csv("test_data/averaging_test_data.csv")
+
+    def scatter(data_frame, column):
+        return px.scatter(data_frame, x="Country", y=column)
+    first = memoize_figure(scatter)(df_raw, "Total-2004")
+
+    def scatter(data_frame, column):  # pylint: disable=function-redefined
+        return px.bar(data_frame, x="Country", y=column)
+    vis_helpers.FIGURE_CACHE.clear()
+    second = memoize_figure(scatter)(df_raw, "Total-2004")
+    assert len(list(tmp_path.iterdir())) == 2
+    assert first.data[0].type == "scatter" and second.data[0].type == "bar"
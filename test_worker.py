@@ -0,0 +1,104 @@
+"""
+Cases and functions for testing the worker.py file
+"""
+import os
+import shutil
+import socket
+import stat
+import threading
+import time
+import pandas as pd
+import pytest
+
+from worker import send_command, serve, worker_running
+
+
+def wait_for(socket_path):
+    """
+    Wait until a worker is listening on a socket.
+
+    Args:
+        socket_path: the filepath of the worker's socket.
+    """
+    for _ in range(200):
+        if os.path.exists(socket_path):
+            return
+        time.sleep(0.05)
+    raise TimeoutError("The worker did not start")
+
+
+def test_worker(tmp_path):
+    """
+    Test that the worker in worker.py runs commands on preloaded data and
+    reloads data when its file changes.
+    """
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    shutil.copy("test_data/averaging_test_data.csv", data_path / "medals.csv")
+    socket_path = str(tmp_path / "worker.sock")
+    thread = threading.Thread(target=serve, args=(socket_path, str(data_path)))
+    thread.start()
+    try:
+        wait_for(socket_path)
+        reply = send_command({"function": "average_data", "args": ["@medals"]}, socket_path)
+        assert reply["ok"]
+        assert reply["output"] == pd.read_csv(
+            "test_data/averaging_test_data_done.csv").to_csv(index=False)
+
+        # Functions can be chained on datasets and their printed output is kept
+        reply = send_command({"function": "model_check",
+                              "args": ["@medals|pivot", "Total ~ GDP"]}, socket_path)
+        assert reply["ok"]
+        assert "OLS Regression Results" in reply["output"]
+        # Formulas can use numpy
+        reply = send_command({"function": "model_check",
+                              "args": ["@medals|pivot", "Total ~ np.log(GDP)"]}, socket_path)
+        assert reply["ok"], reply["output"]
+        assert "np.log(GDP)" in reply["output"]
+
+        # Changing the file reloads it
+        before = send_command({"function": "fingerprint", "args": ["@medals"]}, socket_path)
+        shutil.copy("test_data/gdp_test_data1_clean.csv", data_path / "medals.csv")
+        os.utime(data_path / "medals.csv", (0, 0))
+        after = send_command({"function": "fingerprint", "args": ["@medals"]}, socket_path)
+        assert after["output"] != before["output"]
+        # Only functions in the olympics modules can be called
+        for name in ["len", "OrderedDict", "_missing"]:
+            reply = send_command({"function": name, "args": []}, socket_path)
+            assert not reply["ok"]
+    finally:
+        send_command({"function": "stop"}, socket_path)
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_worker_socket(tmp_path):
+    """
+    Test that the worker in worker.py replaces a socket left over from a
+    stopped worker, only lets this user connect, and refuses to start while
+    another worker is running on its socket.
+    """
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    socket_path = str(tmp_path / "worker.sock")
+    # Leave a socket file that nothing is listening on
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(socket_path)
+    assert not worker_running(socket_path)
+
+    thread = threading.Thread(target=serve, args=(socket_path, str(data_path)))
+    thread.start()
+    try:
+        for _ in range(200):
+            if worker_running(socket_path):
+                break
+            time.sleep(0.05)
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        with pytest.raises(RuntimeError):
+            serve(socket_path, str(data_path))
+        # The running worker keeps answering
+        assert worker_running(socket_path)
+    finally:
+        send_command({"function": "stop"}, socket_path)
+        thread.join(timeout=10)
+    assert not thread.is_alive()
@@ -2,19 +2,150 @@
 Functions for plotting and creating models
 """
 
+import functools
+import hashlib
+import inspect
+import os
+import numpy as np
+import pandas as pd
+import patsy
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 import statsmodels.formula.api as smf
 
+from helpers import cache_get, cache_put, fingerprint, new_cache
+
+# Figures that have already been built, keyed by the builder and its version, a
+# fingerprint of the data, and the other arguments
+FIGURE_CACHE = new_cache()
+# The most figures to keep in memory
+FIGURE_CACHE_SIZE = 32
+# Directory to also save built figures in, so they are kept between sessions
+# (None to only keep them in memory)
+FIGURE_CACHE_DIR = None
+# Names that model formulas can use (e.g. "Total ~ np.log(GDP)")
+FORMULA_NAMESPACE = {"np": np}
+
+
+def argument_key(value):
+    """
+    Describe an argument of a figure builder in a way that changes whenever
+    its contents change, for use in a cache key.
+
+    Dataframes, series, and arrays are fingerprinted (their repr is cut short,
+    so two different ones could share it), lists, tuples, and dictionaries are
+    described item by item, and anything else by its repr.
+
+    Args:
+        value: the argument
+    Returns:
+        A string or tuple of strings describing the argument.
+    """
+    if isinstance(value, pd.DataFrame):
+        return ("DataFrame", fingerprint(value))
+    if isinstance(value, pd.Series):
+        return ("Series", str(value.name), fingerprint(value.to_frame()))
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return ("ndarray", value.dtype.str, repr(value.shape), digest)
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(argument_key(item) for item in value)
+    if isinstance(value, dict):
+        return ("dict",) + tuple((repr(key), argument_key(item))
+                                 for key, item in sorted(value.items(), key=repr))
+    return repr(value)
+
+
+def builder_version(builder):
+    """
+    Compute a short fingerprint of a figure builder's code, so figures saved by
+    an older version of it are not reused.
+
+    Args:
+        builder: function returning a plotly figure
+    Returns:
+        A string of hexadecimal digits identifying the version of the code.
+    """
+    try:
+        code = inspect.getsource(builder).encode("utf-8")
+    except (OSError, TypeError):
+        code = builder.__code__.co_code
+    return hashlib.sha1(code).hexdigest()[:16]
+
+
+def memoize_figure(builder):
+    """
+    Make a figure builder reuse the figure it built before when it is called
+    again with unchanged data and the same arguments.
+
+    Figures are kept in a least recently used cache in memory and, if
+    FIGURE_CACHE_DIR is set, saved there as JSON. Any change to the data, to
+    the other arguments (see argument_key), or to the builder's code changes
+    the key, so an outdated figure is never reused.
+
+    Args:
+        builder: function taking a dataframe and other arguments and returning
+            a plotly figure
+
+    Returns:
+        The memoized builder, which returns a copy of the cached figure.
+    """
+    version = builder_version(builder)
+
+    @functools.wraps(builder)
+    def memoized_builder(data_frame, *args, **kwargs):
+        key = (builder.__name__, version, fingerprint(data_frame), argument_key(args),
+               argument_key(kwargs))
+        fig = cache_get(FIGURE_CACHE, key)
+        path = None
+        if FIGURE_CACHE_DIR is not None:
+            name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+            path = os.path.join(FIGURE_CACHE_DIR, f"{name}.json")
+        if fig is None and path is not None and os.path.exists(path):
+            # Load the figure from the disk cache
+            fig = pio.read_json(path)
+            cache_put(FIGURE_CACHE, key, fig, FIGURE_CACHE_SIZE)
+        if fig is None:
+            fig = builder(data_frame, *args, **kwargs)
+            cache_put(FIGURE_CACHE, key, fig, FIGURE_CACHE_SIZE)
+            if path is not None:
+                os.makedirs(FIGURE_CACHE_DIR, exist_ok=True)
+                pio.write_json(fig, path)
+        # Copy the figure so changes to it do not change the cached one
+        return go.Figure(fig)
+
+    return memoized_builder
+
 
 def medals_plot(data_frame, sort, medal):
     """
     Creates plots from pandas dataframe with a particular type of medal category and a comparative
     factor.
 
+    Shows the figure built by medals_figure, which is reused if the data and
+    arguments have not changed.
+
+    Args:
+        data_frame: pandas dataframe containing information
+        sort: comparative factor ("GDP", "Pop", "Athletes)
+        medal: medal category ("Gold", "Silver", "Bronze", "Total", "Success Rate",
+            or a rank column from helpers.rank_medals such as "Rank")
+    """
+    medals_figure(data_frame, sort, medal).show()
+
+
+@memoize_figure
+def medals_figure(data_frame, sort, medal):
+    """
+    Creates plots from pandas dataframe with a particular type of medal category and a comparative
+    factor.
+
     Args:
         data_frame: pandas dataframe containing information
         sort: comparative factor ("GDP", "Pop", "Athletes)
-        medal: medal category ("Gold", "Silver", "Bronze", "Total", "Success Rate")
+        medal: medal category ("Gold", "Silver", "Bronze", "Total", "Success Rate",
+            or a rank column from helpers.rank_medals such as "Rank")
 
     Returns:
         A plotly figure of the input information.
@@ -64,13 +195,28 @@ def medals_plot(data_frame, sort, medal):
             facet_col="Year",
             color="Year"
         )
-    fig.show()
+    return fig
 
 
 def context_plot(data_frame, sort1="GDP", sort2="Pop"):
     """
     Creates plots from pandas dataframe containing GDP and Pop.
 
+    Shows the figure built by context_figure, which is reused if the data and
+    arguments have not changed.
+
+    Args:
+        sort1: context factor 1 ("GDP", "Pop")
+        sort2: context factor 2 ("GDP", "Pop")
+    """
+    context_figure(data_frame, sort1, sort2).show()
+
+
+@memoize_figure
+def context_figure(data_frame, sort1="GDP", sort2="Pop"):
+    """
+    Creates plots from pandas dataframe containing GDP and Pop.
+
     Args:
         sort1: context factor 1 ("GDP", "Pop")
         sort2: context factor 2 ("GDP", "Pop")
@@ -93,7 +239,7 @@ def context_plot(data_frame, sort1="GDP", sort2="Pop"):
         color="Year",
         facet_col="Year"
     )
-    fig.show()
+    return fig
 
 
 def model_check(data_frame, equation):
@@ -107,18 +253,50 @@ def model_check(data_frame, equation):
     Returns:
         Summary of model fit statistics.
     """
-    # Create model
-    mod = smf.ols(formula=f"{equation}", data=data_frame)
-    res = mod.fit()
+    res = fit_model(data_frame, equation)
     # Print summary of model fit stats
     print(res.summary())
 
 
+def fit_model(data_frame, equation):
+    """
+    Fits an ordinary least squares model.
+
+    Args:
+        data_frame: pandas dataframe containing information
+        equation: formula for creating model, which can use numpy as np
+
+    Returns:
+        The fitted statsmodels results.
+    """
+    # Create model, looking up names used in the formula in FORMULA_NAMESPACE
+    mod = smf.ols(formula=f"{equation}", data=data_frame,
+                  eval_env=patsy.EvalEnvironment([FORMULA_NAMESPACE]))
+    return mod.fit()
+
+
 def average_medals_plot(data_frame, sort, medal):
     """
     Creates plots from pandas dataframe with a particular type of medal category and a comparative
     factor.
 
+    Shows the figure built by average_medals_figure, which is reused if the data and
+    arguments have not changed.
+
+    Args:
+        data_frame: pandas dataframe containing information
+        sort: comparative factor ("Average GDP", "Average Pop", "Average Athletes)
+        medal: medal category ("Average Total")
+    """
+    average_medals_figure(data_frame, sort, medal).show()
+
+
+@memoize_figure
+def average_medals_figure(data_frame, sort, medal):
+    """
+    Creates plots from pandas dataframe with a particular type of medal category and a comparative
+    factor.
+
     Args:
         data_frame: pandas dataframe containing information
         sort: comparative factor ("Average GDP", "Average Pop", "Average Athletes)
@@ -166,13 +344,28 @@ def average_medals_plot(data_frame, sort, medal):
             hover_data=["Country"],
             log_x=True
         )
-    fig.show()
+    return fig
 
 
 def average_context_plot(data_frame, sort1="Average GDP", sort2="Average Pop"):
     """
     Creates plots from pandas dataframe containing GDP and Pop.
 
+    Shows the figure built by average_context_figure, which is reused if the data and
+    arguments have not changed.
+
+    Args:
+        sort1: context factor 1 ("Average GDP", "Average Pop")
+        sort2: context factor 2 ("Average GDP", "Average Pop")
+    """
+    average_context_figure(data_frame, sort1, sort2).show()
+
+
+@memoize_figure
+def average_context_figure(data_frame, sort1="Average GDP", sort2="Average Pop"):
+    """
+    Creates plots from pandas dataframe containing GDP and Pop.
+
     Args:
         sort1: context factor 1 ("Average GDP", "Average Pop")
         sort2: context factor 2 ("Average GDP", "Average Pop")
@@ -192,4 +385,4 @@ def average_context_plot(data_frame, sort1="Average GDP", sort2="Average Pop"):
         hover_data=["Country"],
         log_x=True,
     )
-    fig.show()
+    return fig
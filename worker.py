@@ -0,0 +1,298 @@
+"""
+Long-lived worker that keeps the olympics libraries imported and the data
+loaded, and a thin client for sending it commands.
+
+Start the worker (it runs until stopped):
+    python worker.py start --data data &
+
+Call any public function in helpers.py, vis_helpers.py, or model_helpers.py:
+    python worker.py call average_data @medals_gdp_pop_athletes
+    python worker.py call model_check "@medals_gdp_pop_athletes|pivot" "Total ~ GDP"
+    python worker.py stop
+
+Each argument is read as JSON if possible and as a string otherwise. An
+argument "@name" is the dataset loaded from "<data>/<name>.csv", and
+"@name|function|..." is that dataset passed through each function in turn
+(the result is kept until the file changes). Datasets are reloaded when their
+files change.
+
+The client only imports the standard library, so calls skip the time taken to
+import pandas, grama, statsmodels, and plotly.
+"""
+
+import argparse  # library for command line arguments
+import contextlib  # library for capturing printed output
+import io  # library for capturing printed output
+import json  # library for encoding commands and replies
+import os  # library for working with files
+import socket  # library for talking to the worker
+import socketserver  # library for running the worker
+import sys  # library for exiting with an error code
+import tempfile  # library for finding the temporary directory
+import threading  # library for stopping the worker from a command
+
+# Socket that the worker listens on by default, in this user's runtime
+# directory (or a directory of this user's in the temporary directory)
+SOCKET_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR")
+    or os.path.join(tempfile.gettempdir(), f"olympics-{os.getuid()}"),
+    "olympics-worker.sock")
+# Modules whose public functions can be called, searched in order
+MODULES = ["helpers", "vis_helpers", "model_helpers"]
+
+
+def load_data(data_path, datasets):
+    """
+    Load every CSV in a directory that is new or has changed since it was last
+    loaded.
+
+    Args:
+        data_path: a string representing the directory of the CSVs
+        datasets: a dictionary mapping each dataset name to a tuple of its
+            modification time and dataframe, which is updated in place
+    Returns:
+        True if any dataset was loaded or removed, otherwise False.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    changed = False
+    names = set()
+    for file_name in sorted(os.listdir(data_path)):
+        if not file_name.endswith(".csv"):
+            continue
+        name = file_name[:-len(".csv")]
+        names.add(name)
+        path = os.path.join(data_path, file_name)
+        mtime = os.path.getmtime(path)
+        if name not in datasets or datasets[name][0] != mtime:
+            datasets[name] = (mtime, pd.read_csv(path))
+            changed = True
+    for name in set(datasets) - names:
+        del datasets[name]
+        changed = True
+    return changed
+
+
+def find_function(modules, name):
+    """
+    Find a public function by name in the preloaded modules.
+
+    Args:
+        modules: a list of imported modules to search in order
+        name: a string representing the name of the function
+    Returns:
+        The function.
+    """
+    if not name.startswith("_"):
+        for module in modules:
+            function = getattr(module, name, None)
+            # Only allow functions defined in the module, not ones it imported
+            if callable(function) and getattr(function, "__module__", None) == module.__name__:
+                return function
+    raise ValueError(f"Unknown function: {name}")
+
+
+def resolve_argument(argument, modules, datasets, derived):
+    """
+    Replace references to datasets ("@name" or "@name|function|...") in an
+    argument with the datasets themselves.
+
+    Args:
+        argument: an argument of a command
+        modules: a list of imported modules to find functions in
+        datasets: dictionary of loaded datasets (see load_data)
+        derived: dictionary of datasets that have been passed through
+            functions, keyed by the reference, which is updated in place
+    Returns:
+        The argument, or the dataset that it refers to.
+    """
+    if not isinstance(argument, str) or not argument.startswith("@"):
+        return argument
+    if argument in derived:
+        return derived[argument]
+    name, *steps = argument[1:].split("|")
+    if name not in datasets:
+        raise ValueError(f"Unknown dataset: {name}")
+    value = datasets[name][1]
+    for step in steps:
+        value = find_function(modules, step)(value)
+    if steps:
+        derived[argument] = value
+    return value
+
+
+def run_command(command, modules, datasets, derived):
+    """
+    Call a function for a command and describe what it returned and printed.
+
+    Args:
+        command: dictionary with the "function" name and its "args" and
+            "kwargs"
+        modules: a list of imported modules to find functions in
+        datasets: dictionary of loaded datasets (see load_data)
+        derived: dictionary of derived datasets (see resolve_argument)
+    Returns:
+        A string of everything the function printed followed by what it
+        returned (dataframes are written as CSV).
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    function = find_function(modules, command["function"])
+    args = [resolve_argument(arg, modules, datasets, derived)
+            for arg in command.get("args", [])]
+    kwargs = {key: resolve_argument(value, modules, datasets, derived)
+              for key, value in command.get("kwargs", {}).items()}
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        result = function(*args, **kwargs)
+    output = printed.getvalue()
+    if isinstance(result, pd.DataFrame):
+        output += result.to_csv(index=False)
+    elif result is not None:
+        output += f"{result}\n"
+    return output
+
+
+def worker_running(socket_path):
+    """
+    Check whether a worker is answering on a socket.
+
+    Args:
+        socket_path: a string representing the filepath of the Unix socket
+    Returns:
+        True if something accepts connections on the socket, otherwise False
+        (including when the socket file is left over from a stopped worker).
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+def serve(socket_path=SOCKET_PATH, data_path="data"):
+    """
+    Run the worker until it is sent a "stop" command.
+
+    Args:
+        socket_path: a string representing the filepath of the Unix socket to
+            listen on (default: SOCKET_PATH)
+        data_path: a string representing the directory of the CSVs to load
+            (default: "data")
+    Raises:
+        RuntimeError: if another worker is already running on the socket.
+    """
+    if worker_running(socket_path):
+        raise RuntimeError(f"A worker is already running on {socket_path}")
+    import importlib  # pylint: disable=import-outside-toplevel
+
+    # Import the libraries and load the data once, before any command
+    modules = [importlib.import_module(name) for name in MODULES]
+    datasets, derived = {}, {}
+    load_data(data_path, datasets)
+
+    class Handler(socketserver.StreamRequestHandler):
+        """
+        Answer one command sent over the socket.
+        """
+
+        def handle(self):
+            command = json.loads(self.rfile.readline())
+            if command.get("function") == "stop":
+                reply = {"ok": True, "output": ""}
+                threading.Thread(target=self.server.shutdown).start()
+            else:
+                try:
+                    # Reload changed files and forget what was derived from them
+                    if load_data(data_path, datasets):
+                        derived.clear()
+                    reply = {"ok": True,
+                             "output": run_command(command, modules, datasets, derived)}
+                except Exception as error:  # pylint: disable=broad-except
+                    reply = {"ok": False, "output": f"{type(error).__name__}: {error}\n"}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+    # Remove the socket of a worker that stopped without removing it
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), mode=0o700, exist_ok=True)
+    # Only let this user send commands, from the moment the socket is created
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(umask)
+    with server:
+        server.serve_forever()
+    os.remove(socket_path)
+
+
+def send_command(command, socket_path=SOCKET_PATH):
+    """
+    Send a command to a running worker and wait for its reply.
+
+    Args:
+        command: dictionary with the "function" name and its "args" and
+            "kwargs"
+        socket_path: a string representing the filepath of the worker's Unix
+            socket (default: SOCKET_PATH)
+    Returns:
+        The reply as a dictionary with "ok" and "output".
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(command).encode("utf-8") + b"\n")
+        with client.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+
+def parse_argument(text):
+    """
+    Read a command line argument as JSON if possible and as a string
+    otherwise.
+
+    Args:
+        text: the argument as a string
+    Returns:
+        The parsed argument.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def main():
+    """
+    Run the worker or send it a command from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    actions = parser.add_subparsers(dest="action", required=True)
+    start = actions.add_parser("start", help="run the worker")
+    start.add_argument("--data", default="data")
+    call = actions.add_parser("call", help="call a function in the worker")
+    call.add_argument("function")
+    call.add_argument("args", nargs="*")
+    actions.add_parser("stop", help="stop the worker")
+    args = parser.parse_args()
+
+    if args.action == "start":
+        try:
+            serve(args.socket, args.data)
+        except RuntimeError as error:
+            sys.exit(str(error))
+        return
+    command = {"function": "stop"}
+    if args.action == "call":
+        command = {"function": args.function,
+                   "args": [parse_argument(arg) for arg in args.args]}
+    reply = send_command(command, args.socket)
+    sys.stdout.write(reply["output"])
+    if not reply["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()